@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Report, Symptom, Tag
+from .models import AlertJob, Delivery, InboxEntry, Subscription
 
-admin.site.register(Report)
-admin.site.register(Symptom)
-admin.site.register(Tag)
+admin.site.register(Subscription)
+admin.site.register(Delivery)
+admin.site.register(AlertJob)
+admin.site.register(InboxEntry)
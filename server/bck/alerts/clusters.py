@@ -0,0 +1,132 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from api.businesses import normalize_name
+from api.models import Business, Report
+from .models import ClusterCounter
+from .signals import cluster_detected
+
+logger = logging.getLogger(__name__)
+
+# Counters older than this are no longer read by any window and get pruned.
+RETENTION = timedelta(days=7)
+UPDATE_BATCH = 200
+
+
+def _bucket(created_at):
+    return created_at.replace(minute=0, second=0, microsecond=0)
+
+
+def _counter_keys(report, symptoms, businesses):
+    """Every (kind, key, symptom, bucket) a report counts towards."""
+    keys = []
+    # Prefer the resolved business, so variant spellings count together.
+    business = businesses.get(report.business_id) or normalize_name(report.business_name)
+    if business:
+        keys.append((ClusterCounter.BUSINESS, business))
+    if report.geo_cell:
+        keys.append((ClusterCounter.CELL, report.geo_cell))
+    bucket = _bucket(report.created_at)
+    return [(kind, key, symptom, bucket) for kind, key in keys for symptom in ['', *symptoms]]
+
+
+def _match(keys):
+    return reduce(or_, (Q(kind=kind, key=key, symptom=symptom, bucket=bucket) for kind, key, symptom, bucket in keys))
+
+
+def record_reports(reports):
+    """
+    Add new reports to the hourly counters with one insert plus one UPDATE
+    per distinct increment, then fire cluster_detected for every cluster
+    whose window count crossed the threshold.
+    """
+    if not reports:
+        return []
+    symptoms = defaultdict(list)
+    for report_id, name in Report.symptoms.through.objects.filter(
+        report_id__in=[report.pk for report in reports]
+    ).values_list('report_id', 'symptom__name'):
+        symptoms[report_id].append(name)
+    businesses = dict(Business.objects.filter(
+        pk__in={report.business_id for report in reports if report.business_id}
+    ).values_list('pk', 'normalized_name'))
+
+    increments = Counter()
+    cells = defaultdict(set)
+    for report in reports:
+        keys = _counter_keys(report, symptoms[report.pk], businesses)
+        increments.update(keys)
+        if report.geo_cell:
+            for kind, key, _, _ in keys:
+                cells[(kind, key)].add(report.geo_cell)
+    if not increments:
+        return []
+
+    ClusterCounter.objects.bulk_create(
+        [ClusterCounter(kind=kind, key=key, symptom=symptom, bucket=bucket)
+         for kind, key, symptom, bucket in increments],
+        batch_size=1000, ignore_conflicts=True,
+    )
+    by_amount = defaultdict(list)
+    for counter_key, amount in increments.items():
+        by_amount[amount].append(counter_key)
+    for amount, keys in by_amount.items():
+        for start in range(0, len(keys), UPDATE_BATCH):
+            ClusterCounter.objects.filter(_match(keys[start:start + UPDATE_BATCH])).update(count=F('count') + amount)
+
+    added = Counter()
+    for (kind, key, symptom, _), amount in increments.items():
+        added[(kind, key, symptom)] += amount
+    return _detect_crossings(added, cells)
+
+
+def _detect_crossings(added, cells):
+    threshold = settings.ALERTS_CLUSTER_THRESHOLD
+    window_hours = settings.ALERTS_CLUSTER_WINDOW_HOURS
+    since = _bucket(timezone.now() - timedelta(hours=window_hours - 1))
+    detected = []
+    keys = list(added)
+    for start in range(0, len(keys), UPDATE_BATCH):
+        batch = keys[start:start + UPDATE_BATCH]
+        totals = (
+            ClusterCounter.objects.filter(bucket__gte=since)
+            .filter(reduce(or_, (Q(kind=kind, key=key, symptom=symptom) for kind, key, symptom in batch)))
+            .values_list('kind', 'key', 'symptom')
+            .annotate(total=Sum('count'))
+        )
+        for kind, key, symptom, total in totals:
+            if total - added[(kind, key, symptom)] < threshold <= total:
+                cluster = {
+                    'kind': kind, 'key': key, 'symptom': symptom, 'window_start': since,
+                    'reports': total, 'window_hours': window_hours,
+                }
+                detected.append(cluster)
+                logger.warning('Possible outbreak cluster: %s', cluster)
+                cluster_detected.send(sender=ClusterCounter, cluster=cluster, cells=sorted(cells[(kind, key)]))
+    return detected
+
+
+def active_clusters(window_hours=None, threshold=None, kind=None):
+    """Clusters with at least `threshold` reports in the last `window_hours` hours."""
+    window_hours = window_hours or settings.ALERTS_CLUSTER_WINDOW_HOURS
+    threshold = threshold or settings.ALERTS_CLUSTER_THRESHOLD
+    counters = ClusterCounter.objects.filter(bucket__gte=_bucket(timezone.now() - timedelta(hours=window_hours - 1)))
+    if kind:
+        counters = counters.filter(kind=kind)
+    return (
+        counters.values('kind', 'key', 'symptom')
+        .annotate(reports=Sum('count'))
+        .filter(reports__gte=threshold)
+        .order_by('-reports', 'kind', 'key', 'symptom')
+    )
+
+
+def prune_counters(now=None):
+    return ClusterCounter.objects.filter(bucket__lt=(now or timezone.now()) - RETENTION).delete()[0]
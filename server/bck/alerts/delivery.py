@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.module_loading import import_string
+
+OutgoingMessage = namedtuple('OutgoingMessage', ['key', 'channel', 'recipient', 'subject', 'body'])
+
+
+class EmailTransport:
+    """Sends email over one reused backend connection per session."""
+
+    def __init__(self, backend=None, from_email=None, **connection_kwargs):
+        self.backend = backend
+        self.from_email = from_email or settings.EMAIL_HOST_USER
+        self.connection_kwargs = connection_kwargs
+
+    @contextmanager
+    def session(self):
+        connection = get_connection(self.backend, fail_silently=False, **self.connection_kwargs)
+        connection.open()
+        try:
+            def send(message):
+                email = EmailMessage(message.subject, message.body, self.from_email, [message.recipient])
+                connection.send_messages([email])
+            yield send
+        finally:
+            connection.close()
+
+
+class TwilioTransport:
+    """Sends SMS through a single Twilio client shared by every session."""
+
+    def __init__(self, account_sid=None, auth_token=None, from_number=None):
+        self.account_sid = account_sid or settings.TWILIO_ACCOUNT_SID
+        self.auth_token = auth_token or settings.TWILIO_AUTH_TOKEN
+        self.from_number = from_number or settings.TWILIO_PHONE_NUMBER
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from twilio.rest import Client
+                self._client = Client(self.account_sid, self.auth_token)
+            return self._client
+
+    @contextmanager
+    def session(self):
+        client = self.client
+
+        def send(message):
+            client.messages.create(body=message.body, from_=self.from_number, to=message.recipient)
+        yield send
+
+
+class FakeSmsTransport:
+    """
+    Offline SMS stand-in that records what it was asked to send. `latency`
+    simulates the provider round-trip, `failure_rate` makes sends raise.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self):
+        def send(message):
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                if self._random.random() < self.failure_rate:
+                    raise ConnectionError('Simulated SMS provider failure')
+                self.sent.append(message)
+        yield send
+
+
+class Dispatcher:
+    """
+    Sends a batch of OutgoingMessages through a bounded thread pool.
+
+    Each channel's messages are split into at most `concurrency[channel]`
+    batches, and every batch runs in one worker over one transport session,
+    so that is both the concurrency limit and the number of connections
+    opened. Failed sends are retried with exponential backoff, each time
+    over a reopened session.
+    """
+
+    def __init__(self, transports=None, concurrency=None, retries=None, backoff=None):
+        self.transports = transports or default_transports()
+        self.concurrency = {**settings.ALERTS_DELIVERY_CONCURRENCY, **(concurrency or {})}
+        self.retries = settings.ALERTS_DELIVERY_RETRIES if retries is None else retries
+        self.backoff = settings.ALERTS_DELIVERY_BACKOFF if backoff is None else backoff
+
+    def send(self, messages):
+        """Send messages and return {message.key: True/False}."""
+        by_channel = {}
+        for message in messages:
+            by_channel.setdefault(message.channel, []).append(message)
+
+        batches = []
+        for channel, channel_messages in by_channel.items():
+            workers = max(1, min(self.concurrency.get(channel, 1), len(channel_messages)))
+            batches.extend((channel, channel_messages[i::workers]) for i in range(workers))
+
+        results = {}
+        if not batches:
+            return results
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            for batch_results in pool.map(lambda batch: self._send_batch(*batch), batches):
+                results.update(batch_results)
+        return results
+
+    def _send_batch(self, channel, messages):
+        results = {}
+        transport = self.transports[channel]
+        sessions = ExitStack()
+        try:
+            with sessions:
+                send = sessions.enter_context(transport.session())
+                for message in messages:
+                    results[message.key], send = self._send_with_retries(send, message, sessions, transport)
+        except Exception:
+            # Could not open, reopen or close the session; anything unsent failed.
+            for message in messages:
+                results.setdefault(message.key, False)
+        return results
+
+    def _send_with_retries(self, send, message, sessions, transport):
+        """
+        Returns (sent, send). A failure may have left the connection broken
+        (an SMTP disconnect, a reset socket), so every retry goes through a
+        freshly opened session, which is handed back for the next message.
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random()))
+                try:
+                    sessions.close()
+                except Exception:
+                    pass  # Closing the broken connection can fail as well.
+                send = sessions.enter_context(transport.session())
+            try:
+                send(message)
+                return True, send
+            except Exception:
+                pass
+        return False, send
+
+
+def default_transports():
+    return {
+        'email': EmailTransport(),
+        'sms': import_string(settings.ALERTS_SMS_TRANSPORT)(),
+    }
@@ -0,0 +1,335 @@
+import uuid
+from datetime import timedelta
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from api.geo import bounding_box, cells_around, cells_for_bbox
+from api.models import Report
+from bck.metrics import timed
+from .delivery import Dispatcher, OutgoingMessage
+from .inbox import add_entries
+from .matching import ALERT_RADIUS_KM, GridIndex, match_reports
+from .models import AlertCursor, ClusterAlert, ClusterCounter, Delivery, Subscription
+
+# Only reports from this window are considered, even on the very first run.
+LOOKBACK = timedelta(hours=24)
+# Reports younger than this wait for the next run, so one committed out of id
+# order is not skipped once the cursor has moved past it.
+SETTLE = timedelta(seconds=5)
+# A claim older than this belongs to a run that died mid-send.
+STALE_CLAIM = timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+# Ledger rows updated per statement, well under SQLite's variable limit.
+RECORD_BATCH = 1000
+# Subscriber cells per geo_cell IN (...) query, for the same reason.
+CELL_BATCH = 500
+PHASE_METRIC = 'alerts_phase_duration_seconds'
+
+
+def render_message(report):
+    return f"New food safety alert near your location: {report.title}\n{report.description}"
+
+
+def render_digest(reports, max_items):
+    """One message for several reports: newest first, capped at max_items."""
+    if len(reports) == 1:
+        return render_message(reports[0])
+    reports = sorted(reports, key=lambda report: report.created_at, reverse=True)
+    lines = [f"{len(reports)} new food safety alerts near your location:"]
+    lines.extend(f"- {report.title}" for report in reports[:max_items])
+    if len(reports) > max_items:
+        lines.append(f"+{len(reports) - max_items} more")
+    return "\n".join(lines)
+
+
+def render_cluster(cluster):
+    place = f"at {cluster.key}" if cluster.kind == ClusterCounter.BUSINESS else "near your location"
+    reports = f"{cluster.symptom} reports" if cluster.symptom else "reports"
+    return (
+        f"Possible food poisoning outbreak {place}: "
+        f"{cluster.reports} {reports} in the last {cluster.window_hours} hours"
+    )
+
+
+def queue_deliveries(pairs, contacts):
+    """
+    Write a pending ledger row for every channel of every matched pair.
+    `contacts` maps subscription id to (email, phone). Rows that already
+    exist are left alone, so re-queueing the same match is a no-op.
+    """
+    deliveries = []
+    for subscription_id, report_id in pairs:
+        email, phone = contacts[subscription_id]
+        if email:
+            deliveries.append(Delivery(subscription_id=subscription_id, report_id=report_id, channel=Delivery.EMAIL))
+        if phone:
+            deliveries.append(Delivery(subscription_id=subscription_id, report_id=report_id, channel=Delivery.SMS))
+    Delivery.objects.bulk_create(deliveries, batch_size=1000, ignore_conflicts=True)
+    return len(deliveries)
+
+
+def subscriber_cells(points, radius_km=ALERT_RADIUS_KM):
+    """
+    The grid cells a subscription has to be in to lie within radius_km of
+    any of these (lat, lon) points, or None when some point's neighbourhood
+    is too wide to list (near the poles) and every cell has to be read.
+    """
+    cells = set()
+    for lat, lon in points:
+        around = cells_for_bbox(*bounding_box(lat, lon, radius_km))
+        if around is None:
+            return None
+        cells.update(around)
+    return sorted(cells)
+
+
+def subscriptions_in_cells(queryset, cells):
+    """Narrow a Subscription queryset to `cells`, as one queryset per CELL_BATCH cells."""
+    if cells is None:
+        return [queryset]
+    return [queryset.filter(geo_cell__in=cells[start:start + CELL_BATCH]) for start in range(0, len(cells), CELL_BATCH)]
+
+
+def shard_cursor_name(shard, base='check_alerts'):
+    """Each shard of a split run keeps its own cursor."""
+    return base if shard is None else f'{base}:{shard[0]}/{shard[1]}'
+
+
+def _in_shard(queryset, field, shard):
+    """Keep the rows whose `field` id falls in shard (index, count)."""
+    if shard is None:
+        return queryset
+    index, count = shard
+    return queryset.alias(shard=Mod(field, count)).filter(shard=index)
+
+
+def queue_new_reports(cursor_name='check_alerts', shard=None, chunk_size=None, subscriptions=None):
+    """
+    Match the reports created since the cursor against the subscriptions,
+    queue their deliveries and inbox entries and advance the cursor in the
+    same transaction.
+    The reports are indexed once and the subscriptions in the grid cells
+    around them streamed past chunk_size rows at a time, so memory stays
+    flat as subscribers grow.
+    Pass shard=(index, count) to only match subscriptions with
+    id % count == index, and a `subscriptions` queryset to only match
+    those. Returns the number of reports consumed.
+    """
+    chunk_size = chunk_size or settings.ALERTS_MATCH_CHUNK_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        with timed(PHASE_METRIC, phase='load'):
+            cursor, _ = AlertCursor.objects.select_for_update().get_or_create(name=cursor_name)
+            reports = list(
+                Report.objects.filter(
+                    id__gt=cursor.last_report_id,
+                    created_at__gte=now - LOOKBACK,
+                    created_at__lte=now - SETTLE,
+                ).values_list('id', 'latitude', 'longitude', 'created_at')
+            )
+        if not reports:
+            return 0
+
+        report_times = {report[0]: report[3] for report in reports}
+        located = [report[:3] for report in reports if report[1] is not None and report[2] is not None]
+        if located:
+            index = GridIndex(located)
+            candidates = Subscription.objects.all() if subscriptions is None else subscriptions
+            subscriptions = subscriptions_in_cells(
+                _in_shard(candidates.order_by(), 'id', shard),
+                subscriber_cells((lat, lon) for _, lat, lon in located),
+            )
+            rows = chain.from_iterable(
+                queryset.values_list('id', 'latitude', 'longitude', 'email', 'phone').iterator(chunk_size=chunk_size)
+                for queryset in subscriptions
+            )
+            while True:
+                with timed(PHASE_METRIC, phase='load'):
+                    chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                with timed(PHASE_METRIC, phase='match'):
+                    contacts = {}
+                    pairs = []
+                    for subscription_id, lat, lon, email, phone in chunk:
+                        contacts[subscription_id] = (email, phone)
+                        pairs.extend((subscription_id, report_id) for report_id in index.query(lat, lon))
+                    queue_deliveries(pairs, contacts)
+                    add_entries(pairs, report_times)
+
+        cursor.last_report_id = max(report[0] for report in reports)
+        cursor.save(update_fields=['last_report_id', 'updated_at'])
+    return len(reports)
+
+
+def queue_report_matches(reports):
+    """
+    Queue deliveries and inbox entries for a handful of specific reports,
+    loading only the subscriptions in the grid cells around each report.
+    """
+    for report in reports:
+        if report.latitude is None or report.longitude is None:
+            continue
+        min_lat, max_lat, min_lon, max_lon = bounding_box(report.latitude, report.longitude, ALERT_RADIUS_KM)
+        nearby = Subscription.objects.filter(latitude__range=(min_lat, max_lat), longitude__range=(min_lon, max_lon))
+        contacts = {}
+        points = []
+        for queryset in subscriptions_in_cells(nearby, subscriber_cells([(report.latitude, report.longitude)])):
+            for subscription_id, lat, lon, email, phone in queryset.values_list(
+                'id', 'latitude', 'longitude', 'email', 'phone'
+            ):
+                contacts[subscription_id] = (email, phone)
+                points.append((subscription_id, lat, lon))
+        pairs = match_reports(points, [(report.id, report.latitude, report.longitude)])
+        queue_deliveries(pairs, contacts)
+        add_entries(pairs, {report.id: report.created_at})
+
+
+def queue_cluster_alert(cluster, cells=()):
+    """
+    Record a cluster sent with cluster_detected and queue a warning for
+    every subscription in or next to the grid cells its reports are in:
+    the cell itself for a cell cluster, the cells of the business's recent
+    reports for a business cluster, plus the given `cells` of the reports
+    that crossed the threshold (the only ones known when those reports
+    have no resolved Business). The next check_alerts run sends them.
+    Returns the number of ledger rows queued, 0 if the cluster was
+    already recorded for this window.
+    """
+    cells = set(cells)
+    if cluster['kind'] == ClusterCounter.CELL:
+        cells.add(cluster['key'])
+    else:
+        cells.update(Report.objects.filter(
+            business__normalized_name=cluster['key'],
+            created_at__gte=timezone.now() - timedelta(hours=cluster['window_hours']),
+            geo_cell__isnull=False,
+        ).values_list('geo_cell', flat=True).distinct())
+    cells = sorted({around for cell in cells for around in cells_around(cell)})
+    if not cells:
+        return 0
+    with transaction.atomic():
+        alert, created = ClusterAlert.objects.get_or_create(
+            kind=cluster['kind'], key=cluster['key'], symptom=cluster['symptom'],
+            window_start=cluster['window_start'],
+            defaults={'reports': cluster['reports'], 'window_hours': cluster['window_hours']},
+        )
+        if not created:
+            return 0
+        deliveries = []
+        for queryset in subscriptions_in_cells(Subscription.objects.order_by(), cells):
+            for subscription_id, email, phone in queryset.values_list('id', 'email', 'phone'):
+                if email:
+                    deliveries.append(Delivery(subscription_id=subscription_id, cluster=alert, channel=Delivery.EMAIL))
+                if phone:
+                    deliveries.append(Delivery(subscription_id=subscription_id, cluster=alert, channel=Delivery.SMS))
+        Delivery.objects.bulk_create(deliveries, batch_size=1000, ignore_conflicts=True)
+    return len(deliveries)
+
+
+def _claim(report_ids=None, shard=None, subscriptions=None):
+    now = timezone.now()
+    token = uuid.uuid4()
+    claimable = (
+        Q(status=Delivery.PENDING)
+        | Q(status=Delivery.FAILED, attempts__lt=MAX_ATTEMPTS)
+        | Q(status=Delivery.SENDING, claimed_at__lt=now - STALE_CLAIM)
+    )
+    deliveries = Delivery.objects.filter(claimable)
+    if report_ids is not None:
+        deliveries = deliveries.filter(report_id__in=report_ids)
+    if subscriptions is not None:
+        deliveries = deliveries.filter(subscription__in=subscriptions)
+    _in_shard(deliveries, 'subscription_id', shard).update(status=Delivery.SENDING, claim=token, claimed_at=now)
+    return Delivery.objects.filter(claim=token).select_related('subscription', 'report', 'cluster')
+
+
+def claim_deliveries(report_ids=None, shard=None):
+    """
+    Atomically claim every deliverable ledger row for this run: pending
+    rows, failed rows with attempts left, and rows stuck in a dead run.
+    Pass report_ids to only claim the rows for those reports, and shard to
+    only claim the rows of that shard's subscriptions.
+    """
+    with timed(PHASE_METRIC, phase='load'):
+        return list(_claim(report_ids, shard))
+
+
+def claim_delivery_batches(shard=None, batch_size=None, subscriptions=None):
+    """
+    Claim like claim_deliveries, but yield the claimed rows in batches of
+    about batch_size. A subscription's rows never straddle two batches, so
+    each batch can go to deliver() on its own, digests included. Pass a
+    `subscriptions` queryset to only claim their rows.
+    """
+    batch_size = batch_size or settings.ALERTS_MATCH_CHUNK_SIZE
+    with timed(PHASE_METRIC, phase='load'):
+        claimed = _claim(shard=shard, subscriptions=subscriptions)
+        rows = claimed.order_by('subscription_id', 'id').iterator(chunk_size=batch_size)
+    pending = []
+    while True:
+        with timed(PHASE_METRIC, phase='load'):
+            chunk = list(islice(rows, batch_size))
+        pending.extend(chunk)
+        if len(chunk) < batch_size:
+            if pending:
+                yield pending
+            return
+        split = len(pending)
+        while split and pending[split - 1].subscription_id == pending[-1].subscription_id:
+            split -= 1
+        if split:
+            yield pending[:split]
+            pending = pending[split:]
+
+
+def deliver(deliveries, dispatcher=None, digest=None, max_items=None):
+    """
+    Send claimed deliveries and record the outcome. Returns (sent, failed)
+    counted in ledger rows. In digest mode every subscription gets one
+    message per channel covering all of its reports. Cluster warnings
+    always go out on their own.
+    """
+    digest = settings.ALERTS_DIGEST if digest is None else digest
+    max_items = settings.ALERTS_DIGEST_MAX_ITEMS if max_items is None else max_items
+
+    with timed(PHASE_METRIC, phase='render'):
+        groups = {}
+        for delivery in deliveries:
+            group_key = (delivery.subscription_id, delivery.channel) if digest and not delivery.cluster_id else delivery.pk
+            groups.setdefault(group_key, []).append(delivery)
+
+        messages = []
+        for group_key, group in groups.items():
+            first = group[0]
+            recipient = first.subscription.email if first.channel == Delivery.EMAIL else first.subscription.phone
+            if first.cluster_id:
+                body = render_cluster(first.cluster)
+            else:
+                body = render_digest([delivery.report for delivery in group], max_items)
+            messages.append(OutgoingMessage(group_key, first.channel, recipient, 'Food Safety Alert', body))
+
+    with timed(PHASE_METRIC, phase='deliver'):
+        results = (dispatcher or Dispatcher()).send(messages)
+        sent, failed = [], []
+        for group_key, ok in results.items():
+            (sent if ok else failed).extend(delivery.pk for delivery in groups[group_key])
+        record_outcome(sent, failed)
+    return len(sent), len(failed)
+
+
+def record_outcome(sent, failed):
+    now = timezone.now()
+    for start in range(0, len(sent), RECORD_BATCH):
+        Delivery.objects.filter(pk__in=sent[start:start + RECORD_BATCH]).update(
+            status=Delivery.SENT, sent_at=now, attempts=F('attempts') + 1
+        )
+    for start in range(0, len(failed), RECORD_BATCH):
+        Delivery.objects.filter(pk__in=failed[start:start + RECORD_BATCH]).update(
+            status=Delivery.FAILED, attempts=F('attempts') + 1
+        )
@@ -0,0 +1,76 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.pagination import CursorPagination
+
+from .models import InboxEntry, Subscription
+
+# Inbox item field -> InboxEntry values() column.
+ENTRY_COLUMNS = {
+    'report': 'report_id',
+    'title': 'report__title',
+    'description': 'report__description',
+    'location': 'report__location',
+    'business_name': 'report__business_name',
+    'latitude': 'report__latitude',
+    'longitude': 'report__longitude',
+    'created_at': 'created_at',
+}
+
+
+class InboxPagination(CursorPagination):
+    """Keyset pagination over one subscription's entries, newest report first."""
+    page_size = settings.ALERTS_INBOX_PAGE_SIZE
+    ordering = ('-created_at', '-report_id')
+
+
+def inbox_cutoff(now=None):
+    """Entries for reports older than this have expired."""
+    return (now or timezone.now()) - timedelta(days=settings.ALERTS_INBOX_DAYS)
+
+
+def get_subscription(token, now=None):
+    """
+    The subscription with this inbox token, annotated with `unread`: its
+    unexpired entries not yet marked read. None for an unknown token.
+    """
+    try:
+        token = uuid.UUID(str(token))
+    except ValueError:
+        return None
+    unread = Q(inbox__read_at__isnull=True, inbox__created_at__gte=inbox_cutoff(now))
+    return Subscription.objects.annotate(unread=Count('inbox', filter=unread)).filter(inbox_token=token).first()
+
+
+def entry_rows(subscription, now=None):
+    """values() rows for the subscription's unexpired entries, with the report fields the inbox shows."""
+    return subscription.inbox.filter(created_at__gte=inbox_cutoff(now)).values('read_at', *ENTRY_COLUMNS.values())
+
+
+def represent_entry(row):
+    item = {name: row[column] for name, column in ENTRY_COLUMNS.items()}
+    item['read'] = row['read_at'] is not None
+    return item
+
+
+def add_entries(pairs, report_times):
+    """
+    Write an inbox entry for every matched (subscription id, report id)
+    pair. `report_times` maps report id to its created_at. Pairs already
+    in the inbox are left alone, read or not.
+    """
+    InboxEntry.objects.bulk_create(
+        [
+            InboxEntry(subscription_id=subscription_id, report_id=report_id, created_at=report_times[report_id])
+            for subscription_id, report_id in pairs
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def prune_entries(now=None):
+    return InboxEntry.objects.filter(created_at__lt=inbox_cutoff(now)).delete()[0]
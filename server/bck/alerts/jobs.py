@@ -0,0 +1,57 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import Report
+from .dispatch import claim_deliveries, deliver, queue_report_matches
+from .models import AlertJob
+
+logger = logging.getLogger(__name__)
+
+# A job claimed longer ago than this belongs to a worker that died.
+STALE_CLAIM = timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+
+
+def enqueue_reports(reports):
+    AlertJob.objects.bulk_create([AlertJob(report=report) for report in reports], batch_size=1000)
+
+
+def claim_jobs(limit):
+    """Atomically claim up to `limit` runnable jobs, oldest first."""
+    now = timezone.now()
+    token = uuid.uuid4()
+    runnable = (
+        Q(status=AlertJob.PENDING)
+        | Q(status=AlertJob.FAILED, attempts__lt=MAX_ATTEMPTS)
+        | Q(status=AlertJob.RUNNING, claimed_at__lt=now - STALE_CLAIM)
+    )
+    batch = AlertJob.objects.filter(runnable).order_by('id').values('pk')[:limit]
+    AlertJob.objects.filter(pk__in=batch).filter(runnable).update(
+        status=AlertJob.RUNNING, claim=token, claimed_at=now, attempts=F('attempts') + 1
+    )
+    return list(AlertJob.objects.filter(claim=token))
+
+
+def run_jobs(limit=100, dispatcher=None):
+    """
+    Claim a batch of jobs, match each report against its nearby subscribers
+    and deliver the results. Returns the number of jobs processed.
+    """
+    jobs = claim_jobs(limit)
+    if not jobs:
+        return 0
+    job_ids = [job.pk for job in jobs]
+    report_ids = {job.report_id for job in jobs}
+    try:
+        queue_report_matches(Report.objects.filter(pk__in=report_ids))
+        deliver(claim_deliveries(report_ids=report_ids), dispatcher=dispatcher)
+    except Exception:
+        logger.exception('Alert jobs %s failed', job_ids)
+        AlertJob.objects.filter(pk__in=job_ids).update(status=AlertJob.FAILED)
+        return len(jobs)
+    AlertJob.objects.filter(pk__in=job_ids).update(status=AlertJob.DONE)
+    return len(jobs)
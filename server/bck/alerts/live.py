@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from api.geo import bounding_box, cells_for_bbox, haversine
+
+# Events a slow client may fall behind by before it is disconnected.
+QUEUE_SIZE = 100
+
+
+class LiveSubscriber:
+    def __init__(self, latitude, longitude, radius_km):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_km = radius_km
+        self.cells = cells_for_bbox(*bounding_box(latitude, longitude, radius_km))
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.loop = None
+        self.overflowed = False
+
+    def offer(self, frame):
+        """Runs on the subscriber's event loop."""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Wake the stream with a sentinel so it closes; the client
+            # reconnects and refetches nearby_reports.
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class LiveRegistry:
+    """
+    Connected live-stream clients bucketed by the grid cells their radius
+    covers. A new report is only checked against the clients of its own
+    cell, and its event is serialized once however many clients get it.
+    Registration happens on the event loop, publishing on whichever thread
+    committed the report.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cells = defaultdict(set)
+
+    def __len__(self):
+        with self.lock:
+            return len({subscriber for subscribers in self.cells.values() for subscriber in subscribers})
+
+    def register(self, subscriber):
+        subscriber.loop = asyncio.get_running_loop()
+        with self.lock:
+            for cell in subscriber.cells:
+                self.cells[cell].add(subscriber)
+
+    def unregister(self, subscriber):
+        with self.lock:
+            for cell in subscriber.cells:
+                subscribers = self.cells.get(cell)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self.cells[cell]
+
+    def publish(self, reports, serialize):
+        """Queue an event for every client within radius of each report. Returns the number queued."""
+        queued = 0
+        for report in reports:
+            if not report.geo_cell:
+                continue
+            with self.lock:
+                candidates = list(self.cells.get(report.geo_cell, ()))
+            recipients = [
+                subscriber for subscriber in candidates
+                if haversine(subscriber.latitude, subscriber.longitude, report.latitude, report.longitude)
+                <= subscriber.radius_km
+            ]
+            if not recipients:
+                continue
+            frame = f"id: {report.pk}\nevent: report\ndata: {json.dumps(serialize(report))}\n\n".encode()
+            for subscriber in recipients:
+                try:
+                    subscriber.loop.call_soon_threadsafe(subscriber.offer, frame)
+                except RuntimeError:
+                    # Its loop has shut down; the stream's cleanup never ran.
+                    self.unregister(subscriber)
+                    continue
+                queued += 1
+        return queued
+
+
+registry = LiveRegistry()
@@ -0,0 +1,116 @@
+import socketserver
+import threading
+import time
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from alerts.delivery import Dispatcher, EmailTransport, FakeSmsTransport, OutgoingMessage
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept and discard mail from Django's backend."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.strip().upper()
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            if command.startswith((b'EHLO', b'HELO')):
+                self.reply('250 localhost')
+            elif command == b'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                self.server.received += 1
+                self.reply('250 queued')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), SmtpSinkHandler)
+        self.latency = latency
+        self.received = 0
+
+
+class Command(BaseCommand):
+    help = 'Measure alert delivery throughput against a local SMTP sink and a fake SMS transport'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Messages per channel')
+        parser.add_argument('--smtp-latency', type=float, default=0.005,
+                            help='Seconds the SMTP sink waits before each reply')
+        parser.add_argument('--sms-latency', type=float, default=0.05,
+                            help='Seconds each fake SMS send takes')
+
+    def handle(self, *args, **options):
+        sink = SmtpSink(latency=options['smtp_latency'])
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        smtp = {
+            'backend': 'django.core.mail.backends.smtp.EmailBackend',
+            'host': '127.0.0.1',
+            'port': sink.server_address[1],
+            'use_tls': False,
+            'username': '',
+            'password': '',
+        }
+        count = options['messages']
+        try:
+            started = time.perf_counter()
+            for i in range(count):
+                # The old path: send_mail() opens a fresh connection per message.
+                connection = get_connection(**smtp)
+                EmailMessage('Food Safety Alert', 'body', 'alerts@localhost', [f'user{i}@localhost'],
+                             connection=connection).send()
+            self.report('email, connection per message', count, time.perf_counter() - started)
+
+            for workers in (1, 4):
+                messages = [
+                    OutgoingMessage(i, 'email', f'user{i}@localhost', 'Food Safety Alert', 'body')
+                    for i in range(count)
+                ]
+                dispatcher = Dispatcher(
+                    transports={'email': EmailTransport(from_email='alerts@localhost', **smtp)},
+                    concurrency={'email': workers}, retries=0,
+                )
+                self.timed(f'email, pooled x{workers}', dispatcher, messages)
+
+            for workers in (1, 8, 32):
+                messages = [
+                    OutgoingMessage(i, 'sms', f'+97798000{i:05d}', '', 'body') for i in range(count)
+                ]
+                dispatcher = Dispatcher(
+                    transports={'sms': FakeSmsTransport(latency=options['sms_latency'])},
+                    concurrency={'sms': workers}, retries=0,
+                )
+                self.timed(f'sms, pooled x{workers}', dispatcher, messages)
+        finally:
+            sink.shutdown()
+            sink.server_close()
+
+    def timed(self, label, dispatcher, messages):
+        started = time.perf_counter()
+        results = dispatcher.send(messages)
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for ok in results.values() if not ok)
+        if failed:
+            self.stderr.write(self.style.WARNING(f'{label}: {failed} messages failed'))
+        self.report(label, len(messages), elapsed)
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f'{label:<34} {count:>6} msgs {elapsed:8.3f} s {count / elapsed:10.1f} msg/s')
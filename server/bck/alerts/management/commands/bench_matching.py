@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from alerts.matching import ALERT_RADIUS_KM, match_reports
+from api.geo import haversine, parse_location
+
+# (lat, lon) of the city centres synthetic points are scattered around.
+CITIES = [
+    (27.7172, 85.3240),  # Kathmandu
+    (27.6710, 85.4298),  # Bhaktapur
+    (28.2096, 83.9856),  # Pokhara
+    (26.4525, 87.2718),  # Biratnagar
+    (27.6833, 83.4333),  # Butwal
+]
+
+
+def random_point(rng, spread_deg=0.1):
+    lat, lon = rng.choice(CITIES)
+    return lat + rng.gauss(0, spread_deg), lon + rng.gauss(0, spread_deg)
+
+
+def nested_loop(subscriptions, reports):
+    """The original check_alerts loop: re-parse and haversine every pair."""
+    pairs = []
+    for subscription_id, sub_lat, sub_lon in subscriptions:
+        for report_id, location in reports:
+            report_lat, report_lon = parse_location(location)
+            if report_lat is not None and report_lon is not None:
+                if haversine(sub_lat, sub_lon, report_lat, report_lon) <= ALERT_RADIUS_KM:
+                    pairs.append((subscription_id, report_id))
+    return pairs
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the grid alert matcher against the subscriptions x reports loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscriptions', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--reports', type=int, default=500)
+        parser.add_argument('--max-loop-pairs', type=int, default=10_000_000,
+                            help='Skip the nested loop above this many S x R pairs')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        report_count = options['reports']
+        reports = []
+        for report_id in range(report_count):
+            lat, lon = random_point(rng)
+            reports.append((report_id, f"{lat},{lon}"))
+
+        self.stdout.write(f"{'subs':>8} {'reports':>8} {'pairs':>9} {'loop s':>9} {'grid s':>9} {'speedup':>8}")
+        for subscription_count in options['subscriptions']:
+            subscriptions = [(i, *random_point(rng)) for i in range(subscription_count)]
+
+            started = time.perf_counter()
+            parsed = [(report_id, *parse_location(location)) for report_id, location in reports]
+            grid_pairs = match_reports(subscriptions, parsed)
+            grid_seconds = time.perf_counter() - started
+
+            if subscription_count * report_count <= options['max_loop_pairs']:
+                started = time.perf_counter()
+                loop_pairs = nested_loop(subscriptions, reports)
+                loop_seconds = time.perf_counter() - started
+                if set(loop_pairs) != set(grid_pairs):
+                    self.stderr.write(self.style.ERROR('Grid matcher disagrees with the nested loop'))
+                loop_col, speedup_col = f"{loop_seconds:9.3f}", f"{loop_seconds / grid_seconds:7.1f}x"
+            else:
+                loop_col, speedup_col = f"{'skipped':>9}", f"{'-':>8}"
+
+            self.stdout.write(
+                f"{subscription_count:>8} {report_count:>8} {len(grid_pairs):>9} "
+                f"{loop_col} {grid_seconds:9.3f} {speedup_col}"
+            )
@@ -1,61 +1,46 @@
-from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
-from twilio.rest import Client
-from django.conf import settings
-from alerts.models import Subscription
-from api.models import Report
-from datetime import timedelta
-from django.utils import timezone
-import math
+from django.core.management.base import BaseCommand, CommandError
+from alerts.clusters import prune_counters
+from alerts.delivery import Dispatcher
+from alerts.inbox import prune_entries
+from alerts.dispatch import PHASE_METRIC, claim_delivery_batches, deliver, queue_new_reports, shard_cursor_name
+from bck.metrics import registry
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-def parse_location(location):
-    try:
-        if location and ',' in location:
-            lat, lon = map(float, location.split(','))
-            return lat, lon
-        return None, None
-    except (ValueError, AttributeError):
-        return None, None
+PHASES = ['load', 'match', 'render', 'deliver']
 
 class Command(BaseCommand):
     help = 'Check for nearby reports and send notifications'
 
-    def handle(self, *args, **kwargs):
-        subscriptions = Subscription.objects.all()
-        recent_reports = Report.objects.filter(
-            created_at__gte=timezone.now() - timedelta(hours=24)
-        )
+    def add_arguments(self, parser):
+        parser.add_argument('--digest', action='store_true', default=None,
+                            help='Send one message per subscriber and channel')
+        parser.add_argument('--no-digest', action='store_false', dest='digest',
+                            help='Send one message per matched report')
+        parser.add_argument('--max-items', type=int, default=None,
+                            help='Reports listed in a digest before "+N more"')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Subscriptions matched and deliveries sent per chunk (default ALERTS_MATCH_CHUNK_SIZE)')
+        parser.add_argument('--shard-index', type=int, default=0)
+        parser.add_argument('--shard-count', type=int, default=1,
+                            help='Split the run across this many processes, each with its own --shard-index')
+
+    def handle(self, *args, **options):
+        index, count = options['shard_index'], options['shard_count']
+        if count < 1 or not 0 <= index < count:
+            raise CommandError('--shard-index must be between 0 and --shard-count - 1')
+        shard = (index, count) if count > 1 else None
 
-        for subscription in subscriptions:
-            for report in recent_reports:
-                report_lat, report_lon = parse_location(report.location)
-                if report_lat is not None and report_lon is not None:
-                    distance = haversine(
-                        subscription.latitude, subscription.longitude,
-                        report_lat, report_lon
-                    )
-                    if distance <= 5:
-                        message = f"New food safety alert near your location: {report.title}\n{report.description}"
-                        if subscription.email:
-                            send_mail(
-                                'Food Safety Alert',
-                                message,
-                                settings.EMAIL_HOST_USER,
-                                [subscription.email],
-                                fail_silently=True,
-                            )
-                        if subscription.phone:
-                            client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-                            client.messages.create(
-                                body=message,
-                                from_=settings.TWILIO_PHONE_NUMBER,
-                                to=subscription.phone
-                            )
\ No newline at end of file
+        before = {phase: registry.total(PHASE_METRIC, phase=phase) for phase in PHASES}
+        report_count = queue_new_reports(shard_cursor_name(shard), shard=shard, chunk_size=options['chunk_size'])
+        sent = failed = 0
+        dispatcher = Dispatcher()
+        for batch in claim_delivery_batches(shard=shard, batch_size=options['chunk_size']):
+            batch_sent, batch_failed = deliver(batch, dispatcher, digest=options['digest'], max_items=options['max_items'])
+            sent += batch_sent
+            failed += batch_failed
+        self.stdout.write(f"Processed {report_count} new reports: {sent} sent, {failed} failed")
+        self.stdout.write('Phases: ' + ', '.join(
+            f"{phase} {(registry.total(PHASE_METRIC, phase=phase) - before[phase]) * 1000:.1f}ms" for phase in PHASES
+        ))
+        if index == 0:
+            prune_counters()
+            prune_entries()
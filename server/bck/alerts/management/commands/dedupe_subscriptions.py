@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from alerts.models import Subscription
+from alerts.subscriptions import dedupe
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge subscriptions that share an email or phone number into the newest one, '
+        'moving their deliveries and inbox entries over, and store contacts normalized'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the groups that would be merged')
+
+    def handle(self, *args, **options):
+        before = Subscription.objects.count()
+        groups = dedupe(dry_run=options['dry_run'])
+        for group in groups:
+            self.stdout.write(f"{'Would merge' if options['dry_run'] else 'Merged'} subscriptions {group}")
+        merged = sum(len(group) - 1 for group in groups)
+        if options['dry_run']:
+            self.stdout.write(f"{len(groups)} groups, {merged} of {before} subscriptions would be merged away")
+        else:
+            self.stdout.write(f"Merged {merged} duplicates in {len(groups)} groups: {Subscription.objects.count()} subscriptions left")
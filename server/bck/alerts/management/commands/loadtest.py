@@ -0,0 +1,345 @@
+import json
+import math
+import platform
+import random
+import resource
+import subprocess
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections, transaction
+from django.db.models import F, Max
+from django.test.utils import override_settings
+
+from alerts.delivery import Dispatcher
+from alerts.dispatch import SETTLE, claim_delivery_batches, deliver, queue_new_reports
+from alerts.models import AlertCursor, ClusterAlert, ClusterCounter, Delivery, Subscription
+from api.models import Business, Report
+
+# (name, lat, lon, weight): reports and subscribers cluster around these.
+CITIES = [
+    ('Kathmandu', 27.7172, 85.3240, 0.35),
+    ('Pokhara', 28.2096, 83.9856, 0.15),
+    ('Lalitpur', 27.6644, 85.3188, 0.12),
+    ('Bharatpur', 27.6833, 84.4333, 0.1),
+    ('Biratnagar', 26.4525, 87.2718, 0.1),
+    ('Birgunj', 27.0104, 84.8777, 0.08),
+    ('Butwal', 27.7006, 83.4484, 0.05),
+    ('Dharan', 26.8065, 87.2846, 0.05),
+]
+# Standard deviation of the scatter around a city centre, about 3 km.
+SPREAD_DEG = 0.03
+MARKER = '[loadtest]'
+EMAIL_DOMAIN = 'loadtest.invalid'
+# Its own cursor, so the real check_alerts cursor is never rewound.
+CURSOR_NAME = 'loadtest'
+TITLES = ['Stomach ache after lunch', 'Undercooked momo', 'Stale chowmein', 'Vomiting after dinner',
+          'Dirty kitchen', 'Food poisoning', 'Cold sekuwa', 'Bad smell from the curry']
+
+
+def seeded_subscriptions():
+    return Subscription.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+
+
+def random_point(rng):
+    _, lat, lon, _ = rng.choices(CITIES, weights=[city[3] for city in CITIES])[0]
+    return round(rng.gauss(lat, SPREAD_DEG), 6), round(rng.gauss(lon, SPREAD_DEG), 6)
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered) + errors,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(ordered) / elapsed, 1) if elapsed else None,
+        **{f'p{pct}_ms': round(percentile(ordered, pct) * 1000, 2) if ordered else None for pct in (50, 95, 99)},
+    }
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed clustered reports and subscriptions around Nepali cities, drive the HTTP API and '
+        'check_alerts, and write latency percentiles, throughput and peak memory to JSON. '
+        'Inserts real rows, and created reports reach the alert jobs of whatever subscribers the '
+        'database has: run it against a throwaway database (DB_NAME=...) and pass --throwaway.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reports', type=int, default=2000)
+        parser.add_argument('--subscriptions', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per HTTP scenario')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--alert-runs', type=int, default=3,
+                            help='check_alerts runs over the same seeded backlog')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='loadtest.json')
+        parser.add_argument('--compare', help='Earlier result file to print deltas against')
+        parser.add_argument('--trace-memory', action='store_true',
+                            help='Record the tracemalloc peak per scenario (slows everything down)')
+        parser.add_argument('--throwaway', action='store_true',
+                            help='Confirm the configured database is a throwaway one; required')
+        parser.add_argument('--keep', action='store_true',
+                            help='Leave the seeded and created rows in place instead of deleting them')
+
+    def handle(self, *args, **options):
+        if not options['throwaway']:
+            raise CommandError(
+                f"loadtest writes to the {connection.vendor} database {connection.settings_dict['NAME']}. "
+                'Point DB_NAME at a throwaway copy and pass --throwaway.'
+            )
+        self.options = options
+        rng = random.Random(options['seed'])
+        cursor_start = Report.objects.aggregate(last=Max('id'))['last'] or 0
+        result = {
+            'meta': self.meta(),
+            'seed': self.seed(rng),
+            'scenarios': {},
+        }
+        try:
+            self.run_scenarios(result, cursor_start)
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+        with open(options['output'], 'w', encoding='utf-8') as out:
+            json.dump(result, out, indent=2)
+        self.print_table(result, options['compare'])
+        self.stdout.write(f"Wrote {options['output']}")
+
+    def run_scenarios(self, result, cursor_start):
+        server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                             server_class=ThreadingServer, handler_class=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        try:
+            for name, request in [
+                ('report_list', self.report_list),
+                ('report_create', self.report_create),
+                ('nearby_reports', self.nearby_reports),
+            ]:
+                result['scenarios'][name] = self.measure(lambda: self.drive(request))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.last_write = time.monotonic()
+        result['scenarios']['check_alerts'] = self.measure(lambda: self.check_alerts(cursor_start))
+        result['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def cleanup(self):
+        """
+        Delete the seeded and created reports and subscriptions, the
+        businesses the created reports resolved to, their cluster counts
+        and the loadtest cursor. Cell counters are shared with real
+        reports, so only the test reports' share is taken off them.
+        """
+        reports = Report.objects.filter(business_name__startswith=MARKER)
+        businesses = Business.objects.filter(name__startswith=MARKER)
+        names = list(businesses.values_list('normalized_name', flat=True))
+        # Only reports created through the API were counted, per cell and
+        # hour; those are the ones with a resolved business, as seeding
+        # bulk-inserts without one.
+        counted = Counter(
+            (cell, created_at.replace(minute=0, second=0, microsecond=0))
+            for cell, created_at in reports.filter(business__isnull=False, geo_cell__isnull=False)
+            .values_list('geo_cell', 'created_at')
+        )
+        with transaction.atomic():
+            for (cell, bucket), amount in counted.items():
+                ClusterCounter.objects.filter(
+                    kind=ClusterCounter.CELL, key=cell, symptom='', bucket=bucket
+                ).update(count=F('count') - amount)
+            emptied = ClusterCounter.objects.filter(kind=ClusterCounter.CELL, count=0)
+            if counted:
+                # Cell warnings raised while only test reports were counted there.
+                ClusterAlert.objects.filter(
+                    kind=ClusterCounter.CELL, key__in=emptied.values('key'),
+                    created_at__gte=min(bucket for _, bucket in counted),
+                ).delete()
+            emptied.delete()
+            ClusterCounter.objects.filter(kind=ClusterCounter.BUSINESS, key__in=names).delete()
+            ClusterAlert.objects.filter(kind=ClusterCounter.BUSINESS, key__in=names).delete()
+            reports.delete()
+            businesses.delete()
+            seeded_subscriptions().delete()
+            AlertCursor.objects.filter(name=CURSOR_NAME).delete()
+
+    def meta(self):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                    text=True, timeout=5).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'commit': commit,
+            'started_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'options': {key: self.options[key] for key in
+                        ('reports', 'subscriptions', 'requests', 'concurrency', 'alert_runs', 'seed')},
+        }
+
+    def seed(self, rng):
+        started = time.perf_counter()
+        reports = []
+        for i in range(self.options['reports']):
+            lat, lon = random_point(rng)
+            report = Report(title=rng.choice(TITLES), description='Synthetic load test report',
+                            location=f'{lat},{lon}', business_name=f'{MARKER} {i % 50}')
+            report.set_coordinates()
+            reports.append(report)
+        Report.objects.bulk_create(reports, batch_size=1000)
+
+        subscriptions = []
+        for i in range(self.options['subscriptions']):
+            lat, lon = random_point(rng)
+            subscriptions.append(Subscription(
+                username=f'loadtest{i}', email=f'user{i}@{EMAIL_DOMAIN}',
+                phone=f'+97798{i:08d}' if i % 4 == 0 else None,
+                latitude=lat, longitude=lon,
+            ))
+        Subscription.objects.bulk_create(subscriptions, batch_size=1000)
+        return {
+            'reports': len(reports),
+            'subscriptions': len(subscriptions),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+
+    def measure(self, run):
+        if self.options['trace_memory']:
+            tracemalloc.start()
+        try:
+            summary = run()
+            if self.options['trace_memory']:
+                summary['tracemalloc_peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            if self.options['trace_memory']:
+                tracemalloc.stop()
+        return summary
+
+    def drive(self, request):
+        """Send --requests requests from --concurrency threads, each with its own seeded RNG."""
+        total = self.options['requests']
+        workers = self.options['concurrency']
+        latencies = [[] for _ in range(workers)]
+        errors = [0] * workers
+
+        def work(index):
+            rng = random.Random(self.options['seed'] * 1000 + index)
+            for _ in range(total // workers + (index < total % workers)):
+                started = time.perf_counter()
+                try:
+                    request(rng)
+                except (urllib.error.URLError, OSError):
+                    errors[index] += 1
+                else:
+                    latencies[index].append(time.perf_counter() - started)
+
+        threads = [threading.Thread(target=work, args=(index,)) for index in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize([value for chunk in latencies for value in chunk], sum(errors), time.perf_counter() - started)
+
+    def fetch(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.read()
+
+    def report_list(self, rng):
+        self.fetch('/api/reports/')
+
+    def report_create(self, rng):
+        lat, lon = random_point(rng)
+        self.fetch('/api/reports/', {
+            'title': rng.choice(TITLES),
+            'description': 'Synthetic load test report',
+            'location': f'{lat},{lon}',
+            'business_name': f'{MARKER} {rng.randrange(50)}',
+        })
+
+    def nearby_reports(self, rng):
+        lat, lon = random_point(rng)
+        self.fetch(f'/api/alerts/nearby-reports/?latitude={lat}&longitude={lon}')
+
+    def check_alerts(self, cursor_start):
+        """
+        Run check_alerts' match and deliver phases over the same backlog
+        --alert-runs times, rewinding the loadtest cursor and dropping the
+        seeded subscriptions' deliveries in between, with offline email and
+        SMS transports. Only the seeded subscriptions are matched and
+        claimed, so real subscribers' alerts are left to check_alerts.
+        """
+        wait = SETTLE.total_seconds() - (time.monotonic() - self.last_write)
+        if wait > 0:
+            time.sleep(wait)
+        latencies = []
+        deliveries = 0
+        seeded = seeded_subscriptions()
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                               ALERTS_SMS_TRANSPORT='alerts.delivery.FakeSmsTransport'):
+            for _ in range(self.options['alert_runs']):
+                Delivery.objects.filter(subscription__in=seeded).delete()
+                AlertCursor.objects.update_or_create(name=CURSOR_NAME, defaults={'last_report_id': cursor_start})
+                started = time.perf_counter()
+                queue_new_reports(CURSOR_NAME, subscriptions=seeded)
+                dispatcher = Dispatcher()
+                for batch in claim_delivery_batches(subscriptions=seeded):
+                    deliver(batch, dispatcher)
+                latencies.append(time.perf_counter() - started)
+                deliveries = Delivery.objects.filter(subscription__in=seeded).count()
+        summary = summarize(latencies, 0, sum(latencies))
+        summary['throughput'] = None
+        summary['deliveries'] = deliveries
+        summary['reports_per_second'] = round(self.options['reports'] / min(latencies), 1) if latencies else None
+        connections.close_all()
+        return summary
+
+    def print_table(self, result, compare):
+        baseline = {}
+        if compare:
+            try:
+                with open(compare, encoding='utf-8') as f:
+                    baseline = json.load(f)['scenarios']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f'Cannot read {compare}: {exc}')
+        self.stdout.write(f"{'scenario':<16} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} "
+                          f"{'p99 ms':>9} {'req/s':>8}")
+        for name, summary in result['scenarios'].items():
+            line = (f"{name:<16} {summary['requests']:>8} {summary['errors']:>6} {summary['p50_ms'] or 0:9.2f} "
+                    f"{summary['p95_ms'] or 0:9.2f} {summary['p99_ms'] or 0:9.2f} {summary['throughput'] or 0:8.1f}")
+            before = baseline.get(name)
+            if before and before.get('p95_ms') and summary['p95_ms']:
+                line += f"  p95 {(summary['p95_ms'] / before['p95_ms'] - 1) * 100:+.1f}%"
+            self.stdout.write(line)
+        self.stdout.write(f"max RSS {result['max_rss_kb'] / 1024:.1f} MB")
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import random
+import resource
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from alerts.management.commands.loadtest import MARKER, percentile, random_point
+from api.geo import haversine
+
+
+class Client:
+    def __init__(self, lat, lon, radius):
+        self.lat = lat
+        self.lon = lon
+        self.radius = radius
+        self.received = {}
+        self.reader = None
+        self.writer = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Hold many idle /api/alerts/live/ streams open against a running ASGI server '
+        '(e.g. uvicorn bck.asgi:application), create reports through the API and measure '
+        'connect time, fan-out latency and routing accuracy. Inserts real rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--radius', type=float, default=5)
+        parser.add_argument('--reports', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=0.05, help='Seconds between created reports')
+        parser.add_argument('--settle', type=float, default=2.0,
+                            help='Seconds to keep listening after the last report')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Also write the summary to this JSON file')
+
+    def handle(self, *args, **options):
+        # Each stream is a socket; lift the soft descriptor limit as far as allowed.
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        url = urlsplit(options['url'])
+        self.host, self.port = url.hostname, url.port or 80
+        self.base_url = options['url'].rstrip('/')
+        summary = asyncio.run(self.run(options))
+        for key, value in summary.items():
+            self.stdout.write(f"{key:<22} {value}")
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                json.dump(summary, out, indent=2)
+
+    async def run(self, options):
+        rng = random.Random(options['seed'])
+        clients = [Client(*random_point(rng), options['radius']) for _ in range(options['connections'])]
+
+        started = time.perf_counter()
+        connect_times = await asyncio.gather(*(self.connect(client) for client in clients), return_exceptions=True)
+        connect_seconds = time.perf_counter() - started
+        connected = [client for client, result in zip(clients, connect_times) if not isinstance(result, Exception)]
+        if not connected:
+            raise CommandError(f'No stream connected: {connect_times[0]!r}')
+        readers = [asyncio.create_task(self.listen(client)) for client in connected]
+
+        posted = {}
+        for _ in range(options['reports']):
+            lat, lon = random_point(rng)
+            sent_at = time.perf_counter()
+            report_id = await asyncio.to_thread(self.create_report, lat, lon)
+            posted[report_id] = (lat, lon, sent_at)
+            await asyncio.sleep(options['interval'])
+        await asyncio.sleep(options['settle'])
+        for task in readers:
+            task.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        for client in connected:
+            client.writer.close()
+
+        latencies = []
+        expected = missed = unexpected = 0
+        for client in connected:
+            for report_id, (lat, lon, sent_at) in posted.items():
+                inside = haversine(client.lat, client.lon, lat, lon) <= client.radius
+                received_at = client.received.get(report_id)
+                expected += inside
+                if inside and received_at is None:
+                    missed += 1
+                elif received_at is not None and not inside:
+                    unexpected += 1
+                elif received_at is not None:
+                    latencies.append(received_at - sent_at)
+        latencies.sort()
+        ok_times = sorted(result for result in connect_times if not isinstance(result, Exception))
+        return {
+            'connections': len(connected),
+            'failed_connections': len(clients) - len(connected),
+            'connect_seconds': round(connect_seconds, 3),
+            'connect_p95_ms': round(percentile(ok_times, 95) * 1000, 2),
+            'reports': len(posted),
+            'expected_events': expected,
+            'delivered_events': len(latencies),
+            'missed_events': missed,
+            'unexpected_events': unexpected,
+            **{f'delivery_p{pct}_ms': round(percentile(latencies, pct) * 1000, 2) if latencies else None
+               for pct in (50, 95, 99)},
+        }
+
+    async def connect(self, client):
+        started = time.perf_counter()
+        reader, client.writer = await asyncio.open_connection(self.host, self.port)
+        client.writer.write((
+            f'GET /api/alerts/live/?latitude={client.lat}&longitude={client.lon}&radius={client.radius} HTTP/1.1\r\n'
+            f'Host: {self.host}\r\nAccept: text/event-stream\r\n\r\n'
+        ).encode())
+        status = await reader.readline()
+        if b' 200 ' not in status:
+            client.writer.close()
+            raise ConnectionError(status.decode(errors='replace').strip())
+        while (line := await reader.readline()) and not line.startswith(b': connected'):
+            pass
+        client.reader = reader
+        return time.perf_counter() - started
+
+    async def listen(self, client):
+        # Chunked transfer framing lines never start with "id: ", so the
+        # event ids can be picked straight out of the byte stream.
+        while line := await client.reader.readline():
+            if line.startswith(b'id: '):
+                client.received[int(line[4:])] = time.perf_counter()
+
+    def create_report(self, lat, lon):
+        request = urllib.request.Request(
+            f'{self.base_url}/api/reports/',
+            data=json.dumps({
+                'title': 'Live load test report',
+                'description': 'Synthetic load test report',
+                'location': f'{lat},{lon}',
+                'business_name': f'{MARKER} live',
+            }).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.load(response)['id']
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from alerts.jobs import run_jobs
+
+
+class Command(BaseCommand):
+    help = 'Process queued alert jobs as reports are created'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_jobs(limit=options['batch_size'])
+            if processed:
+                self.stdout.write(f"Processed {processed} alert jobs")
+            elif options['once']:
+                return
+            else:
+                try:
+                    time.sleep(options['poll_interval'])
+                except KeyboardInterrupt:
+                    return
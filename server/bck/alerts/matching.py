@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from api.geo import bounding_box, cell_index, haversine
+
+ALERT_RADIUS_KM = 5
+
+
+class GridIndex:
+    """
+    Buckets (key, lat, lon) points by grid cell so a radius query only
+    computes exact distances for points in the cells around the origin.
+    """
+
+    def __init__(self, points=()):
+        self.cells = defaultdict(list)
+        self.size = 0
+        for key, lat, lon in points:
+            self.add(key, lat, lon)
+
+    def add(self, key, lat, lon):
+        self.cells[cell_index(lat, lon)].append((key, lat, lon))
+        self.size += 1
+
+    def _candidate_cells(self, lat, lon, radius_km):
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        min_row, min_col = cell_index(min_lat, min_lon)
+        max_row, max_col = cell_index(max_lat, max_lon)
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.cells):
+            # Sparse index: cheaper to walk the occupied cells than the box.
+            return [
+                points for (row, col), points in self.cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+            ]
+        return [
+            self.cells[(row, col)]
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)
+            if (row, col) in self.cells
+        ]
+
+    def query(self, lat, lon, radius_km=ALERT_RADIUS_KM):
+        """Yield the keys of all indexed points within radius_km of (lat, lon)."""
+        for points in self._candidate_cells(lat, lon, radius_km):
+            for key, point_lat, point_lon in points:
+                if haversine(lat, lon, point_lat, point_lon) <= radius_km:
+                    yield key
+
+
+def match_reports(subscriptions, reports, radius_km=ALERT_RADIUS_KM):
+    """
+    Return every (subscription_key, report_key) pair within radius_km.
+
+    Both arguments are iterables of (key, lat, lon). The subscriptions are
+    indexed once and each report queries its neighbouring cells, so the
+    cost grows with the number of nearby pairs rather than S x R.
+    """
+    index = GridIndex(subscriptions)
+    pairs = []
+    for report_key, lat, lon in reports:
+        pairs.extend((subscription_key, report_key) for subscription_key in index.query(lat, lon, radius_km))
+    return pairs
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0003_alertcursor_delivery'),
+        ('api', '0002_report_geo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('claim', models.UUIDField(blank=True, null=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_jobs', to='api.report')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='alerts_job_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0004_alertjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['latitude', 'longitude'], name='alerts_sub_lat_lon_idx'),
+        ),
+    ]
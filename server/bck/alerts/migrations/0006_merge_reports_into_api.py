@@ -0,0 +1,90 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:40
+
+import math
+
+from django.db import migrations
+
+# api.geo's parser and grid as they stood when this migration was written;
+# a historical migration must not follow later edits to them.
+CELL_SIZE_DEG = 0.05
+
+
+def parse_location(location):
+    try:
+        if location and ',' in location:
+            lat, lon = map(float, location.split(','))
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return lat, lon
+        return None, None
+    except (ValueError, AttributeError, TypeError):
+        return None, None
+
+
+def cell_for(lat, lon):
+    if lat is None or lon is None:
+        return None
+    return f"{math.floor(lat / CELL_SIZE_DEG)}:{math.floor(lon / CELL_SIZE_DEG)}"
+
+
+def merge_reports(apps, schema_editor):
+    """Copy any rows from the old alerts_* tables into the api tables."""
+    OldReport = apps.get_model('alerts', 'Report')
+    Report = apps.get_model('api', 'Report')
+    Symptom = apps.get_model('api', 'Symptom')
+    Tag = apps.get_model('api', 'Tag')
+
+    # The whole catalog, not only the entries some report uses: the old
+    # tables are dropped below.
+    symptoms = {}
+    for name in apps.get_model('alerts', 'Symptom').objects.order_by('pk').values_list('name', flat=True):
+        if name not in symptoms:
+            symptoms[name], _ = Symptom.objects.get_or_create(name=name)
+    tags = {}
+    for name in apps.get_model('alerts', 'Tag').objects.order_by('pk').values_list('name', flat=True):
+        if name not in tags:
+            tags[name], _ = Tag.objects.get_or_create(name=name)
+
+    for old in OldReport.objects.prefetch_related('symptoms', 'tags').iterator(chunk_size=1000):
+        latitude, longitude = parse_location(old.location)
+        report = Report.objects.create(
+            title=old.title,
+            description=old.description,
+            location=old.location,
+            business_name=old.business_name,
+            latitude=latitude,
+            longitude=longitude,
+            geo_cell=cell_for(latitude, longitude),
+        )
+        # auto_now_add/auto_now overwrote these on insert.
+        Report.objects.filter(pk=report.pk).update(created_at=old.created_at, updated_at=old.updated_at)
+        report.symptoms.add(*(symptoms[symptom.name] for symptom in old.symptoms.all()))
+        report.tags.add(*(tags[tag.name] for tag in old.tags.all()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0005_subscription_lat_lon_idx'),
+        ('api', '0004_report_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_reports, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='report',
+            name='symptoms',
+        ),
+        migrations.RemoveField(
+            model_name='report',
+            name='tags',
+        ),
+        migrations.DeleteModel(
+            name='Symptom',
+        ),
+        migrations.DeleteModel(
+            name='Report',
+        ),
+        migrations.DeleteModel(
+            name='Tag',
+        ),
+    ]
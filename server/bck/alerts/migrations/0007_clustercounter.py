@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0006_merge_reports_into_api'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClusterCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('business', 'Business'), ('cell', 'Grid cell')], max_length=10)),
+                ('key', models.CharField(max_length=255)),
+                ('symptom', models.CharField(blank=True, default='', max_length=100)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket', 'kind'], name='alerts_cluster_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key', 'symptom', 'bucket'), name='alerts_cluster_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_inbox_tokens(apps, schema_editor):
+    # A callable default is evaluated once for AddField, so give each
+    # existing subscription its own token before adding the unique index.
+    Subscription = apps.get_model('alerts', 'Subscription')
+    subscriptions = list(Subscription.objects.only('pk'))
+    for subscription in subscriptions:
+        subscription.inbox_token = uuid.uuid4()
+    Subscription.objects.bulk_update(subscriptions, ['inbox_token'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0007_clustercounter'),
+        ('api', '0007_archivedreport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='inbox_token',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_inbox_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='subscription',
+            name='inbox_token',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='api.report')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox', to='alerts.subscription')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['subscription', 'created_at'], name='alerts_inbox_sub_created_idx'),
+                    models.Index(condition=models.Q(('read_at__isnull', True)), fields=['subscription', 'created_at'], name='alerts_inbox_unread_idx'),
+                    models.Index(fields=['created_at'], name='alerts_inbox_created_idx'),
+                ],
+                'constraints': [models.UniqueConstraint(fields=('subscription', 'report'), name='alerts_inbox_unique')],
+            },
+        ),
+    ]
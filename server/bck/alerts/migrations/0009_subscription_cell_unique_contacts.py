@@ -0,0 +1,143 @@
+import math
+import re
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Everything below is a frozen copy of what api.geo and alerts.subscriptions
+# did when this migration was written, working on the historical models
+# only, so later edits to those modules can't change this migration.
+CELL_SIZE_DEG = 0.05
+PHONE_SEPARATORS = re.compile(r'[\s\-().]')
+BATCH = 500
+
+
+def cell_for(lat, lon):
+    return f"{math.floor(lat / CELL_SIZE_DEG)}:{math.floor(lon / CELL_SIZE_DEG)}"
+
+
+def normalize_email(email):
+    return (email or '').strip().lower() or None
+
+
+def normalize_phone(phone):
+    return PHONE_SEPARATORS.sub('', phone or '') or None
+
+
+def fill_cells(apps, schema_editor):
+    Subscription = apps.get_model('alerts', 'Subscription')
+    subscriptions = list(Subscription.objects.only('pk', 'latitude', 'longitude'))
+    for subscription in subscriptions:
+        subscription.geo_cell = cell_for(subscription.latitude, subscription.longitude)
+    Subscription.objects.bulk_update(subscriptions, ['geo_cell'], batch_size=1000)
+
+
+def duplicate_groups(rows):
+    """Ids of (id, email, phone) rows sharing an email or phone, directly or transitively."""
+    parent = {}
+
+    def find(pk):
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    owners = {}
+    for pk, email, phone in rows:
+        parent.setdefault(pk, pk)
+        for contact in (('email', email), ('phone', phone)):
+            if contact[1] is None:
+                continue
+            if contact in owners:
+                parent[find(pk)] = find(owners[contact])
+            else:
+                owners[contact] = pk
+    groups = defaultdict(list)
+    for pk in parent:
+        groups[find(pk)].append(pk)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def move_rows(model, survivor, duplicate_ids, key):
+    """
+    Hand the duplicates' `model` rows to the survivor, dropping those whose
+    `key` columns the survivor already has a row for.
+    """
+    taken = set(model.objects.filter(subscription_id=survivor.pk).values_list(*key))
+    move, drop = [], []
+    for pk, *value in model.objects.filter(subscription_id__in=duplicate_ids).order_by('pk').values_list('pk', *key):
+        value = tuple(value)
+        if value in taken:
+            drop.append(pk)
+        else:
+            taken.add(value)
+            move.append(pk)
+    for start in range(0, len(drop), BATCH):
+        model.objects.filter(pk__in=drop[start:start + BATCH]).delete()
+    for start in range(0, len(move), BATCH):
+        model.objects.filter(pk__in=move[start:start + BATCH]).update(subscription_id=survivor.pk)
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    The unique constraints below would fail on rows that already share an
+    email or phone, so fold each group into its newest row first, as
+    manage.py dedupe_subscriptions does, then store contacts normalized.
+    """
+    Subscription = apps.get_model('alerts', 'Subscription')
+    Delivery = apps.get_model('alerts', 'Delivery')
+    InboxEntry = apps.get_model('alerts', 'InboxEntry')
+
+    rows = [
+        (pk, normalize_email(email), normalize_phone(phone))
+        for pk, email, phone in Subscription.objects.values_list('pk', 'email', 'phone')
+    ]
+    for group in duplicate_groups(rows):
+        members = sorted(Subscription.objects.filter(pk__in=group), key=lambda s: (s.created_at, s.pk), reverse=True)
+        survivor, duplicates = members[0], members[1:]
+        duplicate_ids = [duplicate.pk for duplicate in duplicates]
+        move_rows(Delivery, survivor, duplicate_ids, ['report_id', 'channel'])
+        move_rows(InboxEntry, survivor, duplicate_ids, ['report_id'])
+        email = survivor.email or next((d.email for d in duplicates if d.email), None)
+        phone = survivor.phone or next((d.phone for d in duplicates if d.phone), None)
+        Subscription.objects.filter(pk__in=duplicate_ids).delete()
+        Subscription.objects.filter(pk=survivor.pk).update(email=email, phone=phone)
+
+    for pk, email, phone in Subscription.objects.values_list('pk', 'email', 'phone'):
+        contacts = (normalize_email(email), normalize_phone(phone))
+        if contacts != (email, phone):
+            Subscription.objects.filter(pk=pk).update(email=contacts[0], phone=contacts[1])
+
+    if schema_editor.connection.vendor == 'postgresql':
+        # Run the deferred foreign key checks of those deletes now;
+        # PostgreSQL won't index a table with trigger events pending.
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0008_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='geo_cell',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.RunPython(fill_cells, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['geo_cell'], name='alerts_sub_cell_idx'),
+        ),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(condition=models.Q(('email__isnull', False)), fields=('email',), name='alerts_sub_email_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(condition=models.Q(('phone__isnull', False)), fields=('phone',), name='alerts_sub_phone_unique'),
+        ),
+    ]
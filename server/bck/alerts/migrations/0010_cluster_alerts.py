@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0009_subscription_cell_unique_contacts'),
+        ('api', '0007_archivedreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClusterAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('business', 'Business'), ('cell', 'Grid cell')], max_length=10)),
+                ('key', models.CharField(max_length=255)),
+                ('symptom', models.CharField(blank=True, default='', max_length=100)),
+                ('reports', models.PositiveIntegerField()),
+                ('window_hours', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='delivery',
+            name='report',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='api.report'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='cluster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='alerts.clusteralert'),
+        ),
+        migrations.AddConstraint(
+            model_name='delivery',
+            constraint=models.UniqueConstraint(condition=models.Q(('cluster__isnull', False)), fields=('subscription', 'cluster', 'channel'), name='alerts_delivery_cluster_unique'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    geo_cell becomes a column the database computes from latitude and
+    longitude. Django can't alter a field into a generated one, so the
+    column is dropped and added back.
+    """
+
+    dependencies = [
+        ('alerts', '0010_cluster_alerts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='subscription',
+            name='alerts_sub_cell_idx',
+        ),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='geo_cell',
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='geo_cell',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Concat(django.db.models.functions.comparison.Cast(django.db.models.functions.math.Floor(django.db.models.expressions.CombinedExpression(models.F('latitude'), '/', models.Value(0.05))), models.BigIntegerField()), models.Value(':'), django.db.models.functions.comparison.Cast(django.db.models.functions.math.Floor(django.db.models.expressions.CombinedExpression(models.F('longitude'), '/', models.Value(0.05))), models.BigIntegerField()), output_field=models.CharField()), output_field=models.CharField(max_length=20)),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['geo_cell'], name='alerts_sub_cell_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def fill_window_start(apps, schema_editor):
+    """
+    Date existing alerts by the window they were raised in, as
+    alerts.clusters does, then fold repeats of one cluster and window into
+    the first, so the unique constraint below can be added.
+    """
+    ClusterAlert = apps.get_model('alerts', 'ClusterAlert')
+    Delivery = apps.get_model('alerts', 'Delivery')
+
+    groups = defaultdict(list)
+    for alert in ClusterAlert.objects.order_by('pk'):
+        start = alert.created_at - timedelta(hours=alert.window_hours - 1)
+        alert.window_start = start.replace(minute=0, second=0, microsecond=0)
+        alert.save(update_fields=['window_start'])
+        groups[(alert.kind, alert.key, alert.symptom, alert.window_start)].append(alert.pk)
+
+    for first, *repeats in groups.values():
+        if not repeats:
+            continue
+        taken = set(Delivery.objects.filter(cluster_id=first).values_list('subscription_id', 'channel'))
+        repeated = Delivery.objects.filter(cluster_id__in=repeats).order_by('pk')
+        for pk, subscription_id, channel in repeated.values_list('pk', 'subscription_id', 'channel'):
+            if (subscription_id, channel) in taken:
+                Delivery.objects.filter(pk=pk).delete()
+            else:
+                taken.add((subscription_id, channel))
+                Delivery.objects.filter(pk=pk).update(cluster_id=first)
+        ClusterAlert.objects.filter(pk__in=repeats).delete()
+
+    if schema_editor.connection.vendor == 'postgresql':
+        # As in 0009: run the deferred foreign key checks of those deletes
+        # before the table is altered.
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0011_subscription_cell_generated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clusteralert',
+            name='window_start',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(fill_window_start, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='clusteralert',
+            name='window_start',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddConstraint(
+            model_name='clusteralert',
+            constraint=models.UniqueConstraint(fields=('kind', 'key', 'symptom', 'window_start'), name='alerts_cluster_alert_unique'),
+        ),
+    ]
@@ -1,37 +1,208 @@
-from django.db import models
-
-class Symptom(models.Model):
-    name = models.CharField(max_length=100, unique=True)
-
-    def __str__(self):
-        return self.name
-
-class Tag(models.Model):
-    name = models.CharField(max_length=100, unique=True)
+import uuid
 
-    def __str__(self):
-        return self.name
-
-class Report(models.Model):
-    title = models.CharField(max_length=200)
-    description = models.TextField()
-    location = models.CharField(max_length=255, blank=True, null=True)
-    business_name = models.CharField(max_length=255, blank=True, null=True)
-    symptoms = models.ManyToManyField(Symptom, blank=True)
-    tags = models.ManyToManyField(Tag, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+from django.db import models
+from django.db.models.functions import Cast, Concat, Floor
 
-    def __str__(self):
-        return self.title
+from api.geo import CELL_SIZE_DEG
 
 class Subscription(models.Model):
+    # One row per contact: subscribe upserts on email or phone, which are
+    # stored normalized (see alerts.subscriptions) and unique when set.
     username = models.CharField(max_length=100)
     email = models.EmailField(blank=True, null=True)
     phone = models.CharField(max_length=15, blank=True, null=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Grid cell of latitude/longitude, the same key as api.geo.cell_for,
+    # so matching can load only the subscribers in the cells around a
+    # report. Computed by the database, so bulk_create and update() keep it
+    # right too.
+    geo_cell = models.GeneratedField(
+        expression=Concat(
+            Cast(Floor(models.F('latitude') / CELL_SIZE_DEG), models.BigIntegerField()),
+            models.Value(':'),
+            Cast(Floor(models.F('longitude') / CELL_SIZE_DEG), models.BigIntegerField()),
+            output_field=models.CharField(),
+        ),
+        output_field=models.CharField(max_length=20),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True) 
+    # Handed back by subscribe; reading the inbox takes it instead of a login.
+    inbox_token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['email'], condition=models.Q(email__isnull=False), name='alerts_sub_email_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['phone'], condition=models.Q(phone__isnull=False), name='alerts_sub_phone_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='alerts_sub_lat_lon_idx'),
+            models.Index(fields=['geo_cell'], name='alerts_sub_cell_idx'),
+        ]
 
     def __str__(self):
         return self.username
+
+class AlertCursor(models.Model):
+    """High-water mark of the last report an alert dispatcher has processed."""
+    name = models.CharField(max_length=50, unique=True)
+    last_report_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_report_id}"
+
+class Delivery(models.Model):
+    """
+    Ledger of notifications, one row per (subscription, report, channel),
+    or per (subscription, cluster, channel) for outbreak cluster warnings.
+    The unique constraints are what keep retries and overlapping runs from
+    sending the same alert twice.
+    """
+    EMAIL = 'email'
+    SMS = 'sms'
+    CHANNEL_CHOICES = [(EMAIL, 'Email'), (SMS, 'SMS')]
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENDING, 'Sending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name='deliveries')
+    report = models.ForeignKey('api.Report', on_delete=models.CASCADE, blank=True, null=True, related_name='deliveries')
+    cluster = models.ForeignKey(
+        'ClusterAlert', on_delete=models.CASCADE, blank=True, null=True, related_name='deliveries',
+    )
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    claim = models.UUIDField(blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['subscription', 'report', 'channel'], name='alerts_delivery_unique'),
+            models.UniqueConstraint(
+                fields=['subscription', 'cluster', 'channel'], condition=models.Q(cluster__isnull=False),
+                name='alerts_delivery_cluster_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'claimed_at'], name='alerts_delivery_status_idx'),
+        ]
+
+    def __str__(self):
+        target = f"cluster {self.cluster_id}" if self.cluster_id else self.report_id
+        return f"{self.channel} {target} -> {self.subscription_id} ({self.status})"
+
+class AlertJob(models.Model):
+    """Queued request to match one new report and notify the subscribers near it."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    report = models.ForeignKey('api.Report', on_delete=models.CASCADE, related_name='alert_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    claim = models.UUIDField(blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='alerts_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"report {self.report_id} ({self.status})"
+
+class ClusterCounter(models.Model):
+    """
+    Hourly report count for one business or grid cell, either overall
+    (symptom '') or for one symptom. Summing the recent buckets gives a
+    sliding-window count without rescanning reports.
+    """
+    BUSINESS = 'business'
+    CELL = 'cell'
+    KIND_CHOICES = [(BUSINESS, 'Business'), (CELL, 'Grid cell')]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=255)
+    symptom = models.CharField(max_length=100, blank=True, default='')
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key', 'symptom', 'bucket'], name='alerts_cluster_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket', 'kind'], name='alerts_cluster_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.key} {self.symptom or '*'} @ {self.bucket}: {self.count}"
+
+class ClusterAlert(models.Model):
+    """
+    A cluster that crossed ALERTS_CLUSTER_THRESHOLD, as sent with
+    cluster_detected. Subscribers around it are warned through Delivery
+    rows pointing here. The unique constraint keeps two ingests that both
+    see the same crossing from warning everyone twice.
+    """
+    kind = models.CharField(max_length=10, choices=ClusterCounter.KIND_CHOICES)
+    key = models.CharField(max_length=255)
+    symptom = models.CharField(max_length=100, blank=True, default='')
+    # The first hourly bucket of the window the threshold was crossed in.
+    window_start = models.DateTimeField()
+    reports = models.PositiveIntegerField()
+    window_hours = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'key', 'symptom', 'window_start'], name='alerts_cluster_alert_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.key} {self.symptom or '*'}: {self.reports} in {self.window_hours}h"
+
+class InboxEntry(models.Model):
+    """
+    A report that matched a subscription, written while matching runs so
+    the inbox endpoint reads one subscription's slice of the index instead
+    of matching on every request. created_at is the report's, and entries
+    older than ALERTS_INBOX_DAYS are hidden and then pruned.
+    """
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name='inbox')
+    report = models.ForeignKey('api.Report', on_delete=models.CASCADE, related_name='inbox_entries')
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['subscription', 'report'], name='alerts_inbox_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['subscription', 'created_at'], name='alerts_inbox_sub_created_idx'),
+            models.Index(
+                fields=['subscription', 'created_at'], condition=models.Q(read_at__isnull=True),
+                name='alerts_inbox_unread_idx',
+            ),
+            models.Index(fields=['created_at'], name='alerts_inbox_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report_id} -> {self.subscription_id}"
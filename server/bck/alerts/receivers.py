@@ -0,0 +1,69 @@
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from api.models import Report
+from api.signals import reports_created
+from .clusters import record_reports
+from .dispatch import queue_cluster_alert
+from .jobs import enqueue_reports
+from .live import registry as live_registry
+from .signals import cluster_detected
+from .tiles import invalidate_tiles
+from .views import serialize_report
+
+
+@receiver(reports_created)
+def enqueue_alert_jobs(sender, reports, **kwargs):
+    enqueue_reports(reports)
+
+
+@receiver(reports_created)
+def update_cluster_counters(sender, reports, **kwargs):
+    record_reports(reports)
+
+
+@receiver(reports_created)
+def invalidate_report_tiles(sender, reports, **kwargs):
+    invalidate_tiles(report.geo_cell for report in reports)
+
+
+@receiver(reports_created)
+def push_live_reports(sender, reports, **kwargs):
+    live_registry.publish(reports, serialize_report)
+
+
+@receiver(cluster_detected)
+def queue_cluster_warnings(sender, cluster, cells=(), **kwargs):
+    queue_cluster_alert(cluster, cells)
+
+
+@receiver(post_init, sender=Report)
+def remember_report_cell(sender, instance, **kwargs):
+    # A moved report is still cached in the tile of the cell it left. Read
+    # __dict__ so a deferred geo_cell isn't fetched just for this.
+    instance._saved_geo_cell = instance.__dict__.get('geo_cell')
+
+
+@receiver([post_save, post_delete], sender=Report)
+def invalidate_report_tile(sender, instance, **kwargs):
+    invalidate_tiles([instance.geo_cell, instance._saved_geo_cell])
+    instance._saved_geo_cell = instance.geo_cell
+
+
+@receiver(m2m_changed, sender=Report.symptoms.through)
+@receiver(m2m_changed, sender=Report.tags.through)
+def invalidate_report_tile_on_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    """Tiles carry symptom and tag names, so changing either drops them too."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_tiles([instance.geo_cell])
+        return
+    # symptom.report_set.add(...) and the like: pk_set holds report ids,
+    # except on clear, where the reports are only known beforehand.
+    if action == 'pre_clear':
+        links = sender.objects.filter(**{instance._meta.model_name: instance}).values('report_id')
+        instance._cleared_report_cells = list(Report.objects.filter(pk__in=links).values_list('geo_cell', flat=True))
+    elif action == 'post_clear':
+        invalidate_tiles(getattr(instance, '_cleared_report_cells', []))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_tiles(Report.objects.filter(pk__in=pk_set).values_list('geo_cell', flat=True))
@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Sent when a cluster's sliding-window report count reaches the threshold,
+# with `cluster`: {"kind", "key", "symptom", "window_start", "reports",
+# "window_hours"} and `cells`: the grid cells of the reports that took it
+# over the threshold.
+cluster_detected = Signal()
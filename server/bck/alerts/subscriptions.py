@@ -0,0 +1,186 @@
+"""
+Subscriptions are keyed by contact: a normalized email or phone number
+belongs to at most one row. subscribe goes through upsert_subscription(),
+and dedupe() folds the rows that already share a contact into one with
+merge_subscriptions().
+"""
+import re
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q, UniqueConstraint
+
+from .models import Subscription
+
+CREATED = 'created'
+UPDATED = 'updated'
+UNVERIFIED = 'unverified'
+
+PHONE_SEPARATORS = re.compile(r'[\s\-().]')
+# Rows moved or deleted per statement, well under SQLite's variable limit.
+MERGE_BATCH = 500
+
+
+class ContactTaken(Exception):
+    """The email or phone to set belongs to another subscription."""
+
+
+def normalize_email(email):
+    email = (email or '').strip().lower()
+    return email or None
+
+
+def normalize_phone(phone):
+    phone = PHONE_SEPARATORS.sub('', phone or '')
+    return phone or None
+
+
+def duplicate_groups(rows):
+    """
+    Group the ids of (id, email, phone) rows that share an email or a
+    phone, directly or through each other. Only groups of two or more are
+    returned.
+    """
+    parent = {}
+
+    def find(pk):
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    owners = {}
+    for pk, email, phone in rows:
+        parent.setdefault(pk, pk)
+        for contact in (('email', email), ('phone', phone)):
+            if contact[1] is None:
+                continue
+            if contact in owners:
+                parent[find(pk)] = find(owners[contact])
+            else:
+                owners[contact] = pk
+    groups = defaultdict(list)
+    for pk in parent:
+        groups[find(pk)].append(pk)
+    return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def _in_batches(queryset, pks, **update):
+    for start in range(0, len(pks), MERGE_BATCH):
+        batch = queryset.filter(pk__in=pks[start:start + MERGE_BATCH])
+        if update:
+            batch.update(**update)
+        else:
+            batch.delete()
+
+
+def merge_subscriptions(survivor, duplicates):
+    """
+    Fold `duplicates` into `survivor` inside the caller's transaction.
+    Their deliveries and inbox entries move over unless the survivor
+    already has the same one (by the model's unique constraint), and the
+    survivor's missing email or phone is taken from the first duplicate
+    that has one. The duplicates are then deleted.
+    """
+    model = type(survivor)
+    duplicate_ids = [duplicate.pk for duplicate in duplicates]
+    for relation in model._meta.related_objects:
+        related, field = relation.related_model, relation.field.name
+        keys = [
+            [name for name in constraint.fields if name != field]
+            for constraint in related._meta.constraints
+            if isinstance(constraint, UniqueConstraint) and field in constraint.fields
+        ]
+        taken = [set(related.objects.filter(**{field: survivor}).values_list(*key)) for key in keys]
+        pk_name = related._meta.pk.attname
+        move, drop = [], []
+        for row in related.objects.filter(**{f'{field}__in': duplicate_ids}).order_by('pk').values():
+            # A NULL in the key never conflicts, as in the database.
+            values = [tuple(row[related._meta.get_field(name).attname] for name in key) for key in keys]
+            values = [value if None not in value else None for value in values]
+            if any(value in seen for value, seen in zip(values, taken) if value is not None):
+                drop.append(row[pk_name])
+                continue
+            for value, seen in zip(values, taken):
+                if value is not None:
+                    seen.add(value)
+            move.append(row[pk_name])
+        _in_batches(related.objects.all(), drop)
+        _in_batches(related.objects.all(), move, **{field: survivor})
+
+    contacts = {
+        'email': survivor.email or next((d.email for d in duplicates if d.email), None),
+        'phone': survivor.phone or next((d.phone for d in duplicates if d.phone), None),
+    }
+    model.objects.filter(pk__in=duplicate_ids).delete()
+    if (contacts['email'], contacts['phone']) != (survivor.email, survivor.phone):
+        survivor.email, survivor.phone = contacts['email'], contacts['phone']
+        model.objects.filter(pk=survivor.pk).update(**contacts)
+
+
+def dedupe(dry_run=False):
+    """
+    Merge every group of subscriptions sharing a normalized email or phone
+    into its newest row, then store all emails and phones normalized.
+    Returns the groups found, as lists of ids.
+    """
+    normalized = {
+        pk: (normalize_email(email), normalize_phone(phone))
+        for pk, email, phone in Subscription.objects.values_list('pk', 'email', 'phone')
+    }
+    groups = duplicate_groups((pk, email, phone) for pk, (email, phone) in normalized.items())
+    if dry_run:
+        return groups
+    with transaction.atomic():
+        for group in groups:
+            members = sorted(Subscription.objects.filter(pk__in=group), key=lambda s: (s.created_at, s.pk), reverse=True)
+            merge_subscriptions(members[0], members[1:])
+        for pk, email, phone in Subscription.objects.values_list('pk', 'email', 'phone'):
+            contacts = (normalize_email(email), normalize_phone(phone))
+            if contacts != (email, phone):
+                Subscription.objects.filter(pk=pk).update(email=contacts[0], phone=contacts[1])
+    return groups
+
+
+def upsert_subscription(username, latitude, longitude, email=None, phone=None, token=None):
+    """
+    Create a subscription for an email or phone no subscription has yet.
+    Anyone can type in someone else's email, so changing an existing
+    subscription takes its inbox token: the token's subscription gets the
+    new username, location and contacts, or ContactTaken is raised when
+    another subscription has one of them. Without a valid token an existing
+    contact's subscription is left as it is. Contacts must already be
+    normalized. Returns (subscription, outcome), outcome being CREATED,
+    UPDATED or UNVERIFIED.
+    """
+    if not (email or phone):
+        raise ValueError('An email or a phone number is required')
+    contact = Q(email=email) if email else Q()
+    if phone:
+        contact |= Q(phone=phone)
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                owner = None
+                if token is not None:
+                    owner = Subscription.objects.select_for_update().filter(inbox_token=token).first()
+                matches = list(Subscription.objects.select_for_update().filter(contact).order_by('-created_at', '-pk'))
+                if owner is None:
+                    if matches:
+                        return matches[0], UNVERIFIED
+                    subscription = Subscription.objects.create(
+                        username=username, email=email, phone=phone, latitude=latitude, longitude=longitude,
+                    )
+                    return subscription, CREATED
+                if any(match.pk != owner.pk for match in matches):
+                    raise ContactTaken('The email or phone number belongs to another subscription')
+                owner.username = username
+                owner.latitude, owner.longitude = latitude, longitude
+                owner.email = email or owner.email
+                owner.phone = phone or owner.phone
+                owner.save()
+                return owner, UPDATED
+        except IntegrityError:
+            # Lost a race to create the same contact; the next pass finds it.
+            if attempt:
+                raise
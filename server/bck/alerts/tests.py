@@ -1,3 +1,575 @@
-from django.test import TestCase
+import asyncio
+import io
+import random
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from alerts.clusters import record_reports
+from alerts.delivery import Dispatcher, OutgoingMessage
+from alerts.dispatch import (
+    STALE_CLAIM, claim_deliveries, claim_delivery_batches, deliver, queue_cluster_alert, queue_new_reports,
+    shard_cursor_name,
+)
+from alerts.jobs import MAX_ATTEMPTS as MAX_JOB_ATTEMPTS, claim_jobs, run_jobs
+from alerts.live import LiveRegistry, LiveSubscriber, QUEUE_SIZE, registry as live_registry
+from alerts.management.commands.loadtest import seeded_subscriptions
+from alerts.models import AlertCursor, AlertJob, ClusterAlert, Delivery, InboxEntry, Subscription
+from api.geo import cell_for
+from api.models import Report, Symptom, Tag
+from bck.metrics import metrics_view, registry as metrics_registry
+
+
+class RecordingTransport:
+    """Offline transport that keeps every message it is asked to send."""
+
+    def __init__(self):
+        self.sent = []
+
+    @contextmanager
+    def session(self):
+        yield self.sent.append
+
+
+def recording_dispatcher():
+    transport = RecordingTransport()
+    return Dispatcher({'email': transport, 'sms': transport}, retries=0), transport
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        Subscription.objects.create(
+            username='u', email='u@example.com', phone='+9779800000', latitude=27.7172, longitude=85.3240,
+        )
+        for i in range(2):
+            Report.objects.create(title=f"report {i}", description='d', location='27.7172,85.3240')
+        Report.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+
+    def test_overlapping_runs_send_each_alert_once(self):
+        dispatcher, transport = recording_dispatcher()
+        # Two dispatchers with their own cursors match the same reports...
+        self.assertEqual((queue_new_reports('a'), queue_new_reports('b')), (2, 2))
+        self.assertEqual(Delivery.objects.count(), 4)
+        # ...and only the first of two overlapping claims gets the rows.
+        first, second = claim_deliveries(), claim_deliveries()
+        self.assertEqual((len(first), len(second)), (4, 0))
+        self.assertEqual(deliver(first, dispatcher, digest=False), (4, 0))
+
+        # A rewound cursor re-matches without queueing anything new.
+        AlertCursor.objects.filter(name='a').update(last_report_id=0)
+        self.assertEqual(queue_new_reports('a'), 2)
+        self.assertEqual(claim_deliveries(), [])
+        self.assertEqual(len(transport.sent), 4)
+
+    def test_stale_claim_is_taken_over(self):
+        queue_new_reports()
+        claimed = claim_deliveries()
+        self.assertEqual(claim_deliveries(), [])
+        # The run that claimed them died mid-send.
+        Delivery.objects.update(claimed_at=timezone.now() - STALE_CLAIM - timedelta(seconds=1))
+        self.assertEqual(sorted(d.pk for d in claim_deliveries()), sorted(d.pk for d in claimed))
+
+
+class DigestTests(TestCase):
+    def test_one_message_per_subscriber_and_channel(self):
+        Subscription.objects.create(
+            username='u', email='u@example.com', phone='+9779800000', latitude=27.7172, longitude=85.3240,
+        )
+        Subscription.objects.create(username='v', email='v@example.com', latitude=27.72, longitude=85.32)
+        now = timezone.now()
+        for i in range(7):
+            report = Report.objects.create(title=f"report {i}", description='d', location='27.7172,85.3240')
+            Report.objects.filter(pk=report.pk).update(created_at=now - timedelta(minutes=10 - i))
+        queue_new_reports()
+
+        dispatcher, transport = recording_dispatcher()
+        self.assertEqual(deliver(claim_deliveries(), dispatcher, digest=True, max_items=5), (21, 0))
+        self.assertEqual(
+            sorted((message.channel, message.recipient) for message in transport.sent),
+            [('email', 'u@example.com'), ('email', 'v@example.com'), ('sms', '+9779800000')],
+        )
+        # Newest first, capped, with the rest counted.
+        self.assertEqual(transport.sent[0].body.splitlines(), [
+            '7 new food safety alerts near your location:',
+            '- report 6', '- report 5', '- report 4', '- report 3', '- report 2',
+            '+2 more',
+        ])
+        self.assertFalse(Delivery.objects.exclude(status=Delivery.SENT).exists())
+
+    def test_without_digest_every_report_is_its_own_message(self):
+        Subscription.objects.create(username='u', email='u@example.com', latitude=27.7172, longitude=85.3240)
+        for i in range(3):
+            Report.objects.create(title=f"report {i}", description='d', location='27.7172,85.3240')
+        Report.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        queue_new_reports()
+        dispatcher, transport = recording_dispatcher()
+        self.assertEqual(deliver(claim_deliveries(), dispatcher, digest=False), (3, 0))
+        self.assertEqual(len(transport.sent), 3)
+
+
+class AlertJobTests(TestCase):
+    def setUp(self):
+        Subscription.objects.create(username='u', email='u@example.com', latitude=27.7172, longitude=85.3240)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(
+                '/api/reports/', {'title': 't', 'description': 'd', 'location': '27.7172,85.3240'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_report_creation_queues_a_job_that_sends(self):
+        job = AlertJob.objects.get()
+        self.assertEqual(job.status, AlertJob.PENDING)
+        # A claimed job is not handed to a second worker.
+        self.assertEqual(len(claim_jobs(10)), 1)
+        self.assertEqual(claim_jobs(10), [])
+        AlertJob.objects.update(status=AlertJob.PENDING)
+
+        dispatcher, transport = recording_dispatcher()
+        self.assertEqual(run_jobs(dispatcher=dispatcher), 1)
+        self.assertEqual(AlertJob.objects.get().status, AlertJob.DONE)
+        self.assertEqual([message.recipient for message in transport.sent], ['u@example.com'])
+        self.assertEqual(run_jobs(dispatcher=dispatcher), 0)
+
+    def test_failed_jobs_are_retried_up_to_max_attempts(self):
+        dispatcher, transport = recording_dispatcher()
+        with mock.patch('alerts.jobs.queue_report_matches', side_effect=RuntimeError('database went away')):
+            with self.assertLogs('alerts.jobs', 'ERROR'):
+                run_jobs(dispatcher=dispatcher)
+        job = AlertJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (AlertJob.FAILED, 1))
+        self.assertEqual(run_jobs(dispatcher=dispatcher), 1)
+        self.assertEqual(AlertJob.objects.get().status, AlertJob.DONE)
+        self.assertEqual(len(transport.sent), 1)
+
+        AlertJob.objects.update(status=AlertJob.FAILED, attempts=MAX_JOB_ATTEMPTS)
+        self.assertEqual(claim_jobs(10), [])
+        # A worker that died mid-job leaves it claimed; it is picked up again later.
+        AlertJob.objects.update(status=AlertJob.RUNNING, attempts=1, claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(len(claim_jobs(10)), 1)
+
+
+class ShardTests(TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        Subscription.objects.bulk_create([
+            Subscription(
+                username=f"u{i}", email=f"u{i}@example.com", phone=f"+97798{i:08d}" if i % 3 == 0 else None,
+                latitude=rng.gauss(27.7172, 0.03), longitude=rng.gauss(85.3240, 0.03),
+            )
+            for i in range(40)
+        ])
+        for i in range(5):
+            lat, lon = rng.gauss(27.7172, 0.03), rng.gauss(85.3240, 0.03)
+            Report.objects.create(title=f"report {i}", description='d', location=f'{lat},{lon}')
+        Report.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+
+    def ledger(self):
+        return set(Delivery.objects.values_list('subscription_id', 'report_id', 'channel'))
+
+    def test_shards_together_match_one_unsharded_run(self):
+        queue_new_reports(chunk_size=7)
+        expected = self.ledger()
+        self.assertGreater(len(expected), 20)
+
+        Delivery.objects.all().delete()
+        InboxEntry.objects.all().delete()
+        for index in range(3):
+            before = self.ledger()
+            queue_new_reports(shard_cursor_name((index, 3)), shard=(index, 3), chunk_size=7)
+            self.assertEqual({row[0] % 3 for row in self.ledger() - before}, {index})
+        self.assertEqual(self.ledger(), expected)
+
+    def test_shard_claims_its_own_rows_in_whole_subscriptions(self):
+        queue_new_reports()
+        batches = list(claim_delivery_batches(shard=(1, 3), batch_size=4))
+        claimed = [delivery for batch in batches for delivery in batch]
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(len(claimed), sum(1 for row in self.ledger() if row[0] % 3 == 1))
+        seen = set()
+        for batch in batches:
+            subscriptions = {delivery.subscription_id for delivery in batch}
+            self.assertFalse(subscriptions & seen)
+            seen |= subscriptions
+        self.assertEqual({subscription_id % 3 for subscription_id in seen}, {1})
+
+        with self.assertRaises(CommandError):
+            call_command('check_alerts', shard_index=3, shard_count=3)
+
+
+class LoadtestTests(TestCase):
+    def test_refuses_without_throwaway(self):
+        with self.assertRaisesMessage(CommandError, '--throwaway'):
+            call_command('loadtest', '--reports', '1', stdout=io.StringIO())
+        self.assertFalse(Report.objects.exists())
+
+    def test_runs_touch_only_seeded_subscriptions(self):
+        real = Subscription.objects.create(username='real', email='real@example.com', latitude=27.7172, longitude=85.3240)
+        Subscription.objects.create(username='seeded', email='user0@loadtest.invalid', latitude=27.7172, longitude=85.3240)
+        Report.objects.create(title='a', description='d', location='27.7172,85.3240')
+        Report.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        seeded = seeded_subscriptions()
+
+        queue_new_reports('loadtest', subscriptions=seeded)
+        self.assertFalse(AlertCursor.objects.filter(name='check_alerts').exists())
+        self.assertEqual(list(Delivery.objects.values_list('subscription__username', flat=True)), ['seeded'])
+        queue_new_reports()
+        self.assertEqual(Delivery.objects.filter(subscription=real, status=Delivery.PENDING).count(), 1)
+        claimed = [delivery for batch in claim_delivery_batches(subscriptions=seeded) for delivery in batch]
+        self.assertEqual([delivery.subscription.username for delivery in claimed], ['seeded'])
+        self.assertEqual(Delivery.objects.filter(subscription=real, status=Delivery.PENDING).count(), 1)
+
+
+class MatchingTests(TestCase):
+    def test_subscriber_moved_with_update_is_matched(self):
+        subscription = Subscription.objects.create(username='u', email='u@example.com', latitude=28.2096, longitude=83.9856)
+        Subscription.objects.filter(pk=subscription.pk).update(latitude=27.7172, longitude=85.3240)
+        Subscription.objects.bulk_create([Subscription(username='v', phone='+9779800000', latitude=27.72, longitude=85.32)])
+        report = Report.objects.create(title='t', description='d', location='27.7172,85.3240')
+        Report.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        queue_new_reports()
+        self.assertEqual(
+            sorted(Delivery.objects.values_list('subscription__username', 'report', 'channel')),
+            [('u', report.pk, 'email'), ('v', report.pk, 'sms')],
+        )
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics_registry.clear()
+
+    def test_requests_are_recorded_and_rendered(self):
+        Report.objects.create(title='t', description='d')
+        client = APIClient()
+        client.get('/api/reports/')
+        client.get('/api/reports/')
+        client.get('/api/reports/search/')
+
+        body = metrics_view(RequestFactory().get('/metrics')).content.decode()
+        self.assertIn('http_requests_total{method="GET",status="200",view="report-list"} 2', body)
+        self.assertIn('http_requests_total{method="GET",status="400",view="report-search"} 1', body)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="report-list"} 2', body)
+        self.assertIn('http_render_duration_seconds_count{method="GET",view="report-list"} 2', body)
+        # Each list request is one page query plus two prefetches.
+        self.assertIn('http_db_queries_sum{method="GET",view="report-list"} 6.000000', body)
+        # Not routed unless METRICS_ENDPOINT is on.
+        self.assertEqual(client.get('/metrics').status_code, 404)
+
+    async def test_async_requests_are_recorded(self):
+        client = AsyncClient()
+        await client.get('/api/reports/')
+        response = await client.get('/api/alerts/live/', {'latitude': 27.7172, 'longitude': 85.3240})
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b': connected\n\n')
+        (subscriber,) = {subscriber for subscribers in live_registry.cells.values() for subscriber in subscribers}
+        subscriber.offer(None)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+        body = metrics_view(RequestFactory().get('/metrics')).content.decode()
+        self.assertIn('http_requests_total{method="GET",status="200",view="report-list"} 1', body)
+        self.assertIn('http_db_queries_sum{method="GET",view="report-list"} 1.000000', body)
+        # The stream is counted, but its time to headers isn't a latency.
+        self.assertIn('http_requests_total{method="GET",status="200",view="live_reports"} 1', body)
+        self.assertNotIn('http_request_duration_seconds_count{method="GET",view="live_reports"}', body)
+
+    def test_slow_requests_are_logged(self):
+        with self.settings(METRICS_SLOW_REQUEST_MS=0, METRICS_SLOW_QUERY_MS=0):
+            with self.assertLogs('bck.performance', 'WARNING') as logs:
+                APIClient().get('/api/reports/')
+        self.assertTrue(any('Slow request' in line and '/api/reports/' in line for line in logs.output))
+        self.assertTrue(any('Slow query' in line for line in logs.output))
+
+
+class SubscribeTests(TestCase):
+    def subscribe(self, **data):
+        return APIClient().post(
+            '/api/alerts/subscribe/', {'username': 'u', 'latitude': 27.7172, 'longitude': 85.3240, **data}, format='json'
+        )
+
+    def test_subscribe_upserts_on_contact(self):
+        response = self.subscribe(email='Me@Example.com')
+        self.assertEqual(response.status_code, 201)
+        token = response.json()['inbox_token']
+
+        # Knowing the email is not enough to change the subscription or get its token.
+        response = self.subscribe(email='me@example.com', username='someone', latitude=0, longitude=0)
+        self.assertEqual((response.status_code, response.json()), (200, {'message': 'Already subscribed'}))
+        self.assertEqual(
+            list(Subscription.objects.values_list('username', 'latitude')), [('u', 27.7172)]
+        )
+
+        # The token is.
+        response = self.subscribe(email='me@example.com', phone='+977 980-0000', latitude=28.2096, token=token)
+        self.assertEqual((response.status_code, response.json()['inbox_token']), (200, token))
+        self.assertEqual(
+            list(Subscription.objects.values_list('email', 'phone', 'latitude', 'geo_cell')),
+            [('me@example.com', '+9779800000', 28.2096, '564:1706')],
+        )
+
+        # A contact someone else has stays theirs.
+        other = self.subscribe(phone='+9779811111').json()['inbox_token']
+        self.assertEqual(self.subscribe(phone='+9779800000', token=other).status_code, 409)
+        self.assertEqual(self.subscribe().status_code, 400)
+
+
+class ClusterAlertTests(TestCase):
+    def test_crossing_threshold_queues_warnings(self):
+        near = Subscription.objects.create(username='near', email='near@example.com', phone='+9779800000',
+                                           latitude=27.7172, longitude=85.3240)
+        Subscription.objects.create(username='far', email='far@example.com', latitude=28.2096, longitude=83.9856)
+        client = APIClient()
+        with self.settings(ALERTS_CLUSTER_THRESHOLD=3), self.assertLogs('alerts.clusters', 'WARNING'):
+            for i in range(3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = client.post('/api/reports/', {
+                        'title': f"report {i}", 'description': 'd', 'location': '27.7172,85.3240',
+                        'business_name': 'Momo Hut',
+                    }, format='json')
+                self.assertEqual(response.status_code, 201)
+        # One warning per cluster (the grid cell and the business), on both channels.
+        warnings = Delivery.objects.filter(cluster__isnull=False)
+        self.assertEqual(
+            sorted(warnings.values_list('cluster__kind', 'channel')),
+            [('business', 'email'), ('business', 'sms'), ('cell', 'email'), ('cell', 'sms')],
+        )
+        self.assertEqual({delivery.subscription_id for delivery in warnings}, {near.pk})
+
+        dispatcher, transport = recording_dispatcher()
+        deliver(claim_deliveries(), dispatcher)
+        bodies = [message.body for message in transport.sent]
+        self.assertIn('Possible food poisoning outbreak at momo hut: 3 reports in the last 6 hours', bodies)
+        self.assertFalse(Delivery.objects.exclude(status=Delivery.SENT).exists())
+
+    def test_same_crossing_is_queued_once(self):
+        Subscription.objects.create(username='near', email='near@example.com', latitude=27.7172, longitude=85.3240)
+        cluster = {
+            'kind': 'cell', 'key': cell_for(27.7172, 85.3240), 'symptom': '',
+            'window_start': timezone.now().replace(minute=0, second=0, microsecond=0), 'reports': 3, 'window_hours': 6,
+        }
+        # As when two ingests both see the count cross the threshold.
+        self.assertEqual(queue_cluster_alert(cluster), 1)
+        self.assertEqual(queue_cluster_alert({**cluster, 'reports': 4}), 0)
+        self.assertEqual((ClusterAlert.objects.count(), Delivery.objects.count()), (1, 1))
+
+    def test_unresolved_business_is_located_by_its_reports(self):
+        Subscription.objects.create(username='near', email='near@example.com', latitude=27.7172, longitude=85.3240)
+        reports = [
+            Report.objects.create(title=f"report {i}", description='d', location='27.7172,85.3240', business_name='Momo Hut')
+            for i in range(3)
+        ]
+        self.assertIsNone(reports[0].business_id)
+        with self.settings(ALERTS_CLUSTER_THRESHOLD=3), self.assertLogs('alerts.clusters', 'WARNING'):
+            record_reports(reports)
+        self.assertEqual(
+            sorted(Delivery.objects.values_list('cluster__kind', 'cluster__key')),
+            [('business', 'momo hut'), ('cell', cell_for(27.7172, 85.3240))],
+        )
+
+
+class DispatcherTests(SimpleTestCase):
+    def test_retry_reopens_broken_session(self):
+        class DroppingTransport:
+            """Every session's connection drops after its first send."""
+            opened = 0
+
+            @contextmanager
+            def session(self):
+                DroppingTransport.opened += 1
+                used = []
+
+                def send(message):
+                    if used:
+                        raise ConnectionError('Connection unexpectedly closed')
+                    used.append(message)
+                yield send
+
+        dispatcher = Dispatcher({'email': DroppingTransport()}, concurrency={'email': 1}, retries=1, backoff=0)
+        messages = [OutgoingMessage(i, 'email', 'me@example.com', 's', 'b') for i in range(3)]
+        self.assertEqual(dispatcher.send(messages), {0: True, 1: True, 2: True})
+        self.assertEqual(DroppingTransport.opened, 3)
+
+
+class LiveRegistryTests(SimpleTestCase):
+    def report(self, pk, lat, lon):
+        return SimpleNamespace(pk=pk, latitude=lat, longitude=lon, geo_cell=cell_for(lat, lon))
+
+    def test_publish_routes_by_cell_and_radius(self):
+        async def run():
+            registry = LiveRegistry()
+            near = LiveSubscriber(27.7172, 85.3240, 5)
+            far = LiveSubscriber(28.2096, 83.9856, 5)
+            registry.register(near)
+            registry.register(far)
+            self.assertEqual(len(registry), 2)
+
+            serialized = []
+            reports = [self.report(1, 27.72, 85.32), self.report(2, 27.80, 85.32), self.report(3, 28.21, 83.99)]
+            # Reports are published from whichever thread committed them.
+            publisher = threading.Thread(target=lambda: registry.publish(reports, lambda r: serialized.append(r.pk) or {'id': r.pk}))
+            publisher.start()
+            await asyncio.to_thread(publisher.join)
+            frames = [await asyncio.wait_for(subscriber.queue.get(), 1) for subscriber in (near, far)]
+            self.assertEqual(frames, [
+                b'id: 1\nevent: report\ndata: {"id": 1}\n\n',
+                b'id: 3\nevent: report\ndata: {"id": 3}\n\n',
+            ])
+            # Report 2 is 9 km away from both, so it was never serialized.
+            self.assertEqual(sorted(serialized), [1, 3])
+            self.assertTrue(near.queue.empty())
+
+            registry.unregister(near)
+            registry.unregister(far)
+            self.assertEqual((len(registry), dict(registry.cells)), (0, {}))
+        asyncio.run(run())
+
+    def test_slow_client_is_disconnected(self):
+        async def run():
+            subscriber = LiveSubscriber(27.7172, 85.3240, 5)
+            for i in range(QUEUE_SIZE + 5):
+                subscriber.offer(f"frame {i}".encode())
+            frames = [subscriber.queue.get_nowait() for _ in range(subscriber.queue.qsize())]
+            self.assertEqual((len(frames), frames[-1]), (QUEUE_SIZE, None))
+        asyncio.run(run())
+
+    async def test_stream(self):
+        response = await AsyncClient().get('/api/alerts/live/', {'latitude': 27.7172, 'longitude': 85.3240})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b': connected\n\n')
+        self.assertEqual(live_registry.publish([self.report(7, 27.72, 85.32)], lambda r: {'id': r.pk}), 1)
+        self.assertEqual(await anext(stream), b'id: 7\nevent: report\ndata: {"id": 7}\n\n')
+        # A client that falls behind is sent the end-of-stream sentinel.
+        (subscriber,) = {subscriber for subscribers in live_registry.cells.values() for subscriber in subscribers}
+        subscriber.offer(None)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(len(live_registry), 0)
+
+        response = await AsyncClient().get('/api/alerts/live/', {'latitude': 27.7, 'longitude': 85.3, 'radius': 50})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_needs_asgi(self):
+        self.assertEqual(self.client.get('/api/alerts/live/', {'latitude': 27.7, 'longitude': 85.3}).status_code, 501)
+
+
+class QueryCountTests(TestCase):
+    """
+    Pin the number of SQL queries per read endpoint so that it stays
+    constant however many reports are on the page.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.symptoms = [Symptom.objects.create(name=f"symptom {i}") for i in range(3)]
+        cls.tags = [Tag.objects.create(name=f"tag {i}") for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def create_reports(self, count, location='27.7172,85.3240'):
+        for i in range(count):
+            report = Report.objects.create(title=f"report {i}", description='d', location=location)
+            report.symptoms.set(self.symptoms)
+            report.tags.set(self.tags)
+
+    def test_nearby_reports(self):
+        for count in (1, 10):
+            Report.objects.all().delete()
+            self.create_reports(count)
+            self.create_reports(2, location='28.2096,83.9856')
+            # reports, symptoms prefetch, tags prefetch
+            with self.assertNumQueries(3):
+                response = self.client.get('/api/alerts/nearby-reports/', {'latitude': 27.72, 'longitude': 85.32})
+            self.assertEqual(len(response.json()), count)
+
+    def test_nearby_reports_cached(self):
+        self.create_reports(3)
+        params = {'latitude': 27.72, 'longitude': 85.32}
+        self.client.get('/api/alerts/nearby-reports/', params)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/alerts/nearby-reports/', {'latitude': 27.721, 'longitude': 85.321})
+        self.assertEqual(len(response.json()), 3)
+
+        # A new report drops its tile, so the next request sees it.
+        self.create_reports(1)
+        response = self.client.get('/api/alerts/nearby-reports/', params)
+        self.assertEqual(len(response.json()), 4)
+
+        # Moving a report away drops the tile it left, without a query to
+        # find out which one that was.
+        report = Report.objects.latest('id')
+        report.location = '28.2096,83.9856'
+        with self.assertNumQueries(1):
+            report.save()
+        self.assertEqual(len(self.client.get('/api/alerts/nearby-reports/', params).json()), 3)
+
+        # So do symptom and tag changes made after the save.
+        Report.objects.filter(geo_cell='554:1706').first().symptoms.clear()
+        response = self.client.get('/api/alerts/nearby-reports/', params)
+        self.assertEqual(sorted(len(report['symptoms']) for report in response.json()), [0, 3, 3])
+        self.symptoms[0].report_set.clear()
+        response = self.client.get('/api/alerts/nearby-reports/', params)
+        self.assertEqual(sorted(len(report['symptoms']) for report in response.json()), [0, 2, 2])
+
+    def test_inbox(self):
+        subscription = Subscription.objects.create(username='u', latitude=27.7172, longitude=85.3240)
+        self.create_reports(3)
+        Report.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        queue_new_reports()
+        # subscription with unread count, page
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/alerts/inbox/', {'token': subscription.inbox_token})
+        self.assertEqual(response.json()['unread'], 3)
+        self.assertEqual(len(response.json()['results']), 3)
+
+        report_id = response.json()['results'][0]['report']
+        response = self.client.post(
+            '/api/alerts/inbox/read/', {'token': str(subscription.inbox_token), 'reports': [report_id]}, format='json'
+        )
+        self.assertEqual(response.json(), {'marked': 1, 'unread': 2})
+
+
+class MergeReportsMigrationTests(TransactionTestCase):
+    before = [('alerts', '0005_subscription_lat_lon_idx'), ('api', '0004_report_filter_indexes')]
+    after = [('alerts', '0006_merge_reports_into_api')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_catalog_is_copied_with_the_reports(self):
+        apps = self.migrate(self.before)
+        OldSymptom = apps.get_model('alerts', 'Symptom')
+        OldTag = apps.get_model('alerts', 'Tag')
+        fever = OldSymptom.objects.create(name='Fever')
+        OldSymptom.objects.create(name='Nausea')
+        OldTag.objects.create(name='Clean')
+        apps.get_model('api', 'Symptom').objects.create(name='Fever')
+        report = apps.get_model('alerts', 'Report').objects.create(
+            title='a', description='d', location='27.7172,85.3240',
+        )
+        report.symptoms.add(fever)
+
+        apps = self.migrate(self.after)
+        Symptom = apps.get_model('api', 'Symptom')
+        # Entries no report uses survive, and existing names aren't doubled.
+        self.assertEqual(sorted(Symptom.objects.values_list('name', flat=True)), ['Fever', 'Nausea'])
+        self.assertEqual(list(apps.get_model('api', 'Tag').objects.values_list('name', flat=True)), ['Clean'])
+        report = apps.get_model('api', 'Report').objects.get()
+        self.assertEqual((report.geo_cell, list(report.symptoms.values_list('name', flat=True))), ('554:1706', ['Fever']))
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from api.lean import related
+from api.models import Report
+
+WINDOW = timedelta(hours=24)
+
+
+def _bucket(now):
+    return int(now.timestamp()) // settings.ALERTS_NEARBY_TILE_SECONDS
+
+
+def _key(cell, bucket):
+    return f"nearby:tile:{cell}:{bucket}"
+
+
+def nearby_rows(reports):
+    """
+    Yield (geo_cell, (id, created_ts, lat, lon, data)) for a report queryset,
+    with data shaped like alerts.views.serialize_report. Built from values()
+    rows plus one query each for the symptom and tag names.
+    """
+    rows = list(reports.values(
+        'id', 'geo_cell', 'created_at', 'latitude', 'longitude', 'title', 'description', 'location', 'business_name',
+    ))
+    ids = [row['id'] for row in rows]
+    symptoms = related(ids, 'symptoms')
+    tags = related(ids, 'tags')
+    for row in rows:
+        data = {
+            'title': row['title'],
+            'description': row['description'],
+            'location': row['location'],
+            'business_name': row['business_name'],
+            'symptoms': [{'name': name} for _, name in symptoms[row['id']]],
+            'tags': [{'name': name} for _, name in tags[row['id']]],
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+        }
+        yield row['geo_cell'], (row['id'], row['created_at'].timestamp(), row['latitude'], row['longitude'], data)
+
+
+def get_tiles(cells, now=None):
+    """
+    Return {cell: [(id, created_ts, lat, lon, data), ...]} for the reports
+    in each grid cell created in the last 24 hours (plus up to one bucket
+    of slack). Cached tiles are reused; the missing ones are built with
+    three queries and cached until the time bucket rolls over.
+    """
+    now = now or timezone.now()
+    bucket = _bucket(now)
+    keys = {_key(cell, bucket): cell for cell in cells}
+    cached = cache.get_many(keys)
+    tiles = {keys[key]: tile for key, tile in cached.items()}
+
+    missing = [cell for cell in cells if cell not in tiles]
+    if missing:
+        bucket_start = bucket * settings.ALERTS_NEARBY_TILE_SECONDS
+        since = datetime.fromtimestamp(bucket_start, tz=dt_timezone.utc) - WINDOW
+        built = {cell: [] for cell in missing}
+        for cell, row in nearby_rows(
+            Report.objects.filter(geo_cell__in=missing, created_at__gte=since).order_by('id')
+        ):
+            built[cell].append(row)
+        cache.set_many(
+            {_key(cell, bucket): tile for cell, tile in built.items()},
+            timeout=settings.ALERTS_NEARBY_TILE_SECONDS,
+        )
+        tiles.update(built)
+    return tiles
+
+
+def recent_rows(tiles, now=None):
+    """Return the tile rows still inside the 24 hour window, ordered by id."""
+    cutoff = (now or timezone.now()).timestamp() - WINDOW.total_seconds()
+    rows = [row for tile in tiles.values() for row in tile if row[1] >= cutoff]
+    rows.sort(key=lambda row: row[0])
+    return rows
+
+
+def invalidate_tiles(cells):
+    """Drop the current bucket's tile for each cell a report landed in."""
+    bucket = _bucket(timezone.now())
+    cache.delete_many([_key(cell, bucket) for cell in set(cells) if cell])
@@ -4,4 +4,8 @@ from . import views
 urlpatterns = [
     path('subscribe/', views.subscribe, name='subscribe'),
     path('nearby-reports/', views.nearby_reports, name='nearby_reports'),
+    path('clusters/', views.clusters, name='clusters'),
+    path('live/', views.live_reports, name='live_reports'),
+    path('inbox/', views.inbox, name='inbox'),
+    path('inbox/read/', views.inbox_read, name='inbox_read'),
 ]
\ No newline at end of file
@@ -1,16 +1,40 @@
+import asyncio
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import serializers, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from .models import Subscription
 from api.models import Report, Symptom, Tag
-import math
+from api.geo import bounding_box, cell_center, cells_for_bbox, haversine
+from api.lean import parse_fields
+from .clusters import active_clusters
+from .inbox import InboxPagination, entry_rows, get_subscription, inbox_cutoff, represent_entry
+from .live import LiveSubscriber, registry as live_registry
+from .subscriptions import CREATED, UNVERIFIED, ContactTaken, normalize_email, normalize_phone, upsert_subscription
+from .models import ClusterCounter
+from .tiles import get_tiles, nearby_rows, recent_rows
 from datetime import timedelta
+from django.conf import settings
 from django.utils import timezone
 
 class SubscriptionSerializer(serializers.ModelSerializer):
+    # The inbox token from the first subscribe, to change the subscription.
+    token = serializers.UUIDField(required=False, write_only=True)
+
     class Meta:
         model = Subscription
-        fields = ['username', 'email', 'phone', 'latitude', 'longitude']
+        fields = ['username', 'email', 'phone', 'latitude', 'longitude', 'token']
+        # An existing email or phone is handled by upsert_subscription instead.
+        extra_kwargs = {'email': {'validators': []}, 'phone': {'validators': []}}
+
+    def validate(self, attrs):
+        attrs['email'] = normalize_email(attrs.get('email'))
+        attrs['phone'] = normalize_phone(attrs.get('phone'))
+        if not (attrs['email'] or attrs['phone']):
+            raise serializers.ValidationError('Provide an email or a phone number')
+        return attrs
 
 class SymptomSerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,32 +54,71 @@ class ReportSerializer(serializers.ModelSerializer):
         model = Report
         fields = ['title', 'description', 'location', 'business_name', 'symptoms', 'tags']
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+NEARBY_RADIUS_KM = 5
+NEARBY_FIELDS = ReportSerializer.Meta.fields + ['latitude', 'longitude']
+# Wider radii cover too many grid cells to route new reports by cell.
+LIVE_MAX_RADIUS_KM = 15
 
-def parse_location(location):
-    try:
-        if location and ',' in location:
-            lat, lon = map(float, location.split(','))
-            if -90 <= lat <= 90 and -180 <= lon <= 180:
-                return lat, lon
-        return None, None
-    except (ValueError, AttributeError, TypeError):
-        return None, None
+def serialize_report(report):
+    serialized_report = ReportSerializer(report).data
+    serialized_report['latitude'] = report.latitude
+    serialized_report['longitude'] = report.longitude
+    return serialized_report
 
 @api_view(['POST'])
 def subscribe(request):
+    """
+    Subscribe an email and/or phone to alerts near latitude/longitude. To
+    change an existing subscription, send the inbox `token` it was given;
+    without it the subscription is left unchanged and no token is returned.
+    """
     serializer = SubscriptionSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save()
-        return Response({'message': 'Subscription successful'}, status=status.HTTP_201_CREATED)
+        try:
+            subscription, outcome = upsert_subscription(**serializer.validated_data)
+        except ContactTaken as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        if outcome == UNVERIFIED:
+            return Response({'message': 'Already subscribed'}, status=status.HTTP_200_OK)
+        return Response(
+            {'message': 'Subscription successful', 'inbox_token': subscription.inbox_token},
+            status=status.HTTP_201_CREATED if outcome == CREATED else status.HTTP_200_OK,
+        )
     return Response({'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+def inbox(request):
+    """
+    Reports matched to the subscription whose inbox token is ?token=,
+    newest first and paginated with ?cursor=, plus the unread count.
+    """
+    subscription = get_subscription(request.GET.get('token'))
+    if subscription is None:
+        return Response({'error': 'Unknown inbox token'}, status=status.HTTP_404_NOT_FOUND)
+    paginator = InboxPagination()
+    page = paginator.paginate_queryset(entry_rows(subscription), request)
+    return Response({
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'unread': subscription.unread,
+        'results': [represent_entry(row) for row in page],
+    })
+
+@api_view(['POST'])
+def inbox_read(request):
+    """Mark the listed report ids in the `token` inbox as read, or every entry if `reports` is left out."""
+    subscription = get_subscription(request.data.get('token'))
+    if subscription is None:
+        return Response({'error': 'Unknown inbox token'}, status=status.HTTP_404_NOT_FOUND)
+    entries = subscription.inbox.filter(read_at__isnull=True, created_at__gte=inbox_cutoff())
+    reports = request.data.get('reports')
+    if reports is not None:
+        if not isinstance(reports, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in reports):
+            return Response({'error': 'reports must be a list of report ids'}, status=status.HTTP_400_BAD_REQUEST)
+        entries = entries.filter(report_id__in=reports)
+    marked = entries.update(read_at=timezone.now())
+    return Response({'marked': marked, 'unread': subscription.unread - marked})
+
 @api_view(['GET'])
 def nearby_reports(request):
     latitude = request.GET.get('latitude')
@@ -72,20 +135,97 @@ def nearby_reports(request):
     except ValueError:
         return Response({'error': 'Latitude and longitude must be valid numbers'}, status=status.HTTP_400_BAD_REQUEST)
 
+    fields = None
+    if request.GET.get('fields'):
+        try:
+            fields = parse_fields(request.GET['fields'], NEARBY_FIELDS)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
-        reports = Report.objects.filter(
-            created_at__gte=timezone.now() - timedelta(hours=24)
-        )
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, NEARBY_RADIUS_KM)
+        cells = cells_for_bbox(min_lat, max_lat, min_lon, max_lon)
+        if cells is None:
+            # Too many cells to cache per tile (near the poles); go straight to the database.
+            rows = [
+                row for _, row in nearby_rows(Report.objects.filter(
+                    created_at__gte=timezone.now() - timedelta(hours=24),
+                    latitude__range=(min_lat, max_lat),
+                    longitude__range=(min_lon, max_lon),
+                ))
+            ]
+        else:
+            rows = recent_rows(get_tiles(cells))
+
         nearby = []
-        for report in reports:
-            report_lat, report_lon = parse_location(report.location)
-            if report_lat is not None and report_lon is not None:
-                distance = haversine(latitude, longitude, report_lat, report_lon)
-                if distance <= 5:
-                    serialized_report = ReportSerializer(report).data
-                    serialized_report['latitude'] = report_lat
-                    serialized_report['longitude'] = report_lon
-                    nearby.append(serialized_report)
+        for _, _, report_lat, report_lon, data in rows:
+            distance = haversine(latitude, longitude, report_lat, report_lon)
+            if distance <= NEARBY_RADIUS_KM:
+                nearby.append(data if fields is None else {name: data[name] for name in fields})
         return Response(nearby)
     except Exception as e:
-        return Response({'error': f'Server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({'error': f'Server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def clusters(request):
+    try:
+        hours = int(request.GET.get('hours', settings.ALERTS_CLUSTER_WINDOW_HOURS))
+        min_reports = int(request.GET.get('min_reports', settings.ALERTS_CLUSTER_THRESHOLD))
+    except ValueError:
+        return Response({'error': 'hours and min_reports must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not (1 <= hours <= 168) or min_reports < 1:
+        return Response({'error': 'hours must be 1-168 and min_reports at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+    kind = request.GET.get('kind')
+    if kind not in (None, ClusterCounter.BUSINESS, ClusterCounter.CELL):
+        return Response({'error': 'kind must be business or cell'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = []
+    for cluster in active_clusters(window_hours=hours, threshold=min_reports, kind=kind):
+        if cluster['kind'] == ClusterCounter.CELL:
+            cluster['latitude'], cluster['longitude'] = cell_center(cluster['key'])
+        results.append(cluster)
+    return Response(results)
+
+async def live_reports(request):
+    """
+    Server-Sent Events stream of reports created from now on within
+    `radius` km (default NEARBY_RADIUS_KM) of latitude/longitude. Needs the
+    ASGI server (bck.asgi), and only sees reports saved in the same process.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live reports are only served over ASGI'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    try:
+        latitude = float(request.GET['latitude'])
+        longitude = float(request.GET['longitude'])
+        radius = float(request.GET.get('radius', NEARBY_RADIUS_KM))
+    except KeyError:
+        return JsonResponse({'error': 'Latitude and longitude are required'}, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return JsonResponse({'error': 'Latitude, longitude and radius must be valid numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius <= LIVE_MAX_RADIUS_KM):
+        return JsonResponse({'error': f'Coordinates out of range or radius not within 0-{LIVE_MAX_RADIUS_KM} km'},
+                            status=status.HTTP_400_BAD_REQUEST)
+    subscriber = LiveSubscriber(latitude, longitude, radius)
+    if subscriber.cells is None:
+        return JsonResponse({'error': 'Radius too large this close to a pole'}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(_live_events(subscriber), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def _live_events(subscriber):
+    live_registry.register(subscriber)
+    try:
+        yield b': connected\n\n'
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscriber.queue.get(), settings.ALERTS_LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing the idle connection.
+                frame = b': keepalive\n\n'
+            if frame is None:
+                return
+            yield frame
+    finally:
+        live_registry.unregister(subscriber)
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import ArchivedReport, Business, Report, Symptom, Tag
+
+admin.site.register(ArchivedReport)
+admin.site.register(Business)
+admin.site.register(Report)
+admin.site.register(Symptom)
+admin.site.register(Tag)
@@ -0,0 +1,84 @@
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+
+from .models import Business, BusinessTrigram
+
+# Jaccard similarity of trigram sets above which two names are taken to be
+# the same business ("Thakali Kitchen" vs "Thakali Kitchn"), while
+# "Everest Cafe" and "Everest Cafe & Bar" stay apart.
+SIMILARITY_THRESHOLD = 0.7
+# How many trigram-sharing businesses are scored exactly per lookup.
+MAX_CANDIDATES = 10
+
+
+def normalize_name(name):
+    name = (name or "").lower().replace("&", " and ")
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", name)).strip()
+
+
+def trigrams(normalized):
+    """Trigram set of a normalized name, with words padded like pg_trgm."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class BusinessResolver:
+    """
+    Resolves free-text names to Business rows: an exact normalized match,
+    else the most similar business sharing trigrams, else a new business.
+    Results are memoized, so one resolver should serve a whole batch.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.cache = {}
+
+    def resolve(self, name):
+        normalized = normalize_name(name)
+        if not normalized:
+            return None
+        if normalized not in self.cache:
+            self.cache[normalized] = self._lookup(normalized) or self._create(name.strip(), normalized)
+        return self.cache[normalized]
+
+    def _lookup(self, normalized):
+        business = Business.objects.filter(normalized_name=normalized).first()
+        if business is not None:
+            return business
+        grams = trigrams(normalized)
+        candidates = (
+            BusinessTrigram.objects.filter(trigram__in=grams)
+            .values("business_id", "business__trigram_count")
+            .annotate(shared=Count("id"))
+            .order_by("-shared")[:MAX_CANDIDATES]
+        )
+        best_id, best_score = None, 0.0
+        for candidate in candidates:
+            score = candidate["shared"] / (len(grams) + candidate["business__trigram_count"] - candidate["shared"])
+            if score > best_score:
+                best_id, best_score = candidate["business_id"], score
+        if best_id is not None and best_score >= self.threshold:
+            return Business.objects.get(pk=best_id)
+        return None
+
+    def _create(self, name, normalized):
+        grams = trigrams(normalized)
+        try:
+            with transaction.atomic():
+                business = Business.objects.create(name=name, normalized_name=normalized, trigram_count=len(grams))
+                BusinessTrigram.objects.bulk_create(
+                    [BusinessTrigram(business=business, trigram=gram) for gram in grams]
+                )
+        except IntegrityError:
+            # Another request created it first.
+            business = Business.objects.get(normalized_name=normalized)
+        return business
+
+
+def resolve_business(name):
+    return BusinessResolver().resolve(name)
@@ -0,0 +1,50 @@
+import hashlib
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+# A write invalidates the entries at once in this process's cache; the
+# timeout bounds how long processes with their own local-memory cache keep
+# serving the list from before it.
+CATALOG_TIMEOUT = 300
+
+
+def _key(model, part):
+    return f"catalog:{model._meta.label_lower}:{part}"
+
+
+def get_catalog(model, serializer_class):
+    """
+    Return {"data", "etag", "last_modified"} for the full list of `model`
+    rendered with `serializer_class`, building and caching it on a miss.
+    """
+    entry = cache.get(_key(model, "payload"))
+    if entry is None:
+        data = serializer_class(model.objects.order_by("pk"), many=True).data
+        body = JSONRenderer().render(data)
+        last_modified = cache.get(_key(model, "modified"))
+        if last_modified is None:
+            last_modified = timezone.now().replace(microsecond=0)
+            cache.set(_key(model, "modified"), last_modified, CATALOG_TIMEOUT)
+        entry = {
+            "data": data,
+            "etag": '"%s"' % hashlib.sha256(body).hexdigest()[:32],
+            "last_modified": last_modified,
+        }
+        cache.set(_key(model, "payload"), entry, CATALOG_TIMEOUT)
+    return entry
+
+
+def get_catalog_ids(model):
+    """Return the frozenset of primary keys currently in the catalog."""
+    ids = cache.get(_key(model, "ids"))
+    if ids is None:
+        ids = frozenset(model.objects.values_list("pk", flat=True))
+        cache.set(_key(model, "ids"), ids, CATALOG_TIMEOUT)
+    return ids
+
+
+def invalidate_catalog(model):
+    cache.set(_key(model, "modified"), timezone.now().replace(microsecond=0), CATALOG_TIMEOUT)
+    cache.delete_many([_key(model, "payload"), _key(model, "ids")])
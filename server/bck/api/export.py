@@ -0,0 +1,43 @@
+import csv
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import ReportSerializer
+
+CSV_COLUMNS = [
+    "id", "title", "description", "location", "business_name", "business", "latitude", "longitude",
+    "symptoms", "tags", "created_at", "updated_at",
+]
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(reports):
+    for report in reports:
+        yield json.dumps(ReportSerializer(report).data, cls=JSONEncoder) + "\n"
+
+
+def iter_csv(reports):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for report in reports:
+        yield writer.writerow([
+            report.id,
+            report.title,
+            report.description,
+            report.location,
+            report.business_name,
+            report.business_id,
+            report.latitude,
+            report.longitude,
+            ";".join(symptom.name for symptom in report.symptoms.all()),
+            ";".join(tag.name for tag in report.tags.all()),
+            report.created_at.isoformat(),
+            report.updated_at.isoformat(),
+        ])
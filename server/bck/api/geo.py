@@ -0,0 +1,91 @@
+import math
+
+EARTH_RADIUS_KM = 6371
+
+# Size of one grid cell in degrees. 0.05 deg is roughly 5.5 km north-south,
+# so a 5 km search around Kathmandu touches at most a 3x3 block of cells.
+CELL_SIZE_DEG = 0.05
+
+# Past this many cells the cell filter stops being selective and the
+# bounding-box range filter alone is used instead.
+MAX_QUERY_CELLS = 64
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+def parse_location(location):
+    try:
+        if location and ',' in location:
+            lat, lon = map(float, location.split(','))
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return lat, lon
+        return None, None
+    except (ValueError, AttributeError, TypeError):
+        return None, None
+
+
+def cell_index(lat, lon):
+    return math.floor(lat / CELL_SIZE_DEG), math.floor(lon / CELL_SIZE_DEG)
+
+
+def cell_key(row, col):
+    return f"{row}:{col}"
+
+
+def cell_for(lat, lon):
+    """Return the grid cell key for a point, or None if it has no coordinates."""
+    if lat is None or lon is None:
+        return None
+    return cell_key(*cell_index(lat, lon))
+
+
+def cell_center(key):
+    row, col = map(int, key.split(":"))
+    return (row + 0.5) * CELL_SIZE_DEG, (col + 0.5) * CELL_SIZE_DEG
+
+
+def cells_around(key):
+    """The 3x3 block of cell keys centred on `key`."""
+    row, col = map(int, key.split(":"))
+    return [cell_key(row + drow, col + dcol) for drow in (-1, 0, 1) for dcol in (-1, 0, 1)]
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) enclosing every point within
+    radius_km of (lat, lon). Longitude opens up to the full range near the
+    poles or when the box would cross the antimeridian.
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat <= 1e-9:
+        return min_lat, max_lat, -180.0, 180.0
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180 or max_lon > 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def cells_for_bbox(min_lat, max_lat, min_lon, max_lon):
+    """
+    Return the keys of every grid cell overlapping the box, or None when the
+    box covers more than MAX_QUERY_CELLS cells.
+    """
+    min_row, min_col = cell_index(min_lat, min_lon)
+    max_row, max_col = cell_index(max_lat, max_lon)
+    if (max_row - min_row + 1) * (max_col - min_col + 1) > MAX_QUERY_CELLS:
+        return None
+    return [
+        cell_key(row, col)
+        for row in range(min_row, max_row + 1)
+        for col in range(min_col, max_col + 1)
+    ]
@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+
+from .geo import EARTH_RADIUS_KM, bounding_box
+
+# Upper bound on the size of one origins x points distance matrix. At
+# float64 this keeps each chunk's working set to a few tens of MB.
+MAX_CHUNK_ELEMENTS = 2_000_000
+
+
+def haversine_many(lat, lon, lats, lons):
+    """Distance in km from one origin to every point in lats/lons."""
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    lat, lon = math.radians(lat), math.radians(lon)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def equirectangular_many(lat, lon, lats, lons):
+    """
+    Cheap flat-earth approximation of haversine_many. Accurate to well
+    under 1% at city scale; use it to rank or prefilter, not to decide.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    x = np.radians(lons - lon) * math.cos(math.radians(lat))
+    y = np.radians(lats - lat)
+    return EARTH_RADIUS_KM * np.hypot(x, y)
+
+
+def bbox_mask(lat, lon, lats, lons, radius_km):
+    """Boolean mask of the points inside the bounding box of the radius."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    return (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+
+
+def within_radius(lat, lon, lats, lons, radius_km):
+    """
+    Indices of the points within radius_km of the origin. The bounding box
+    discards most points before the exact haversine runs on the rest.
+    """
+    candidates = np.flatnonzero(bbox_mask(lat, lon, lats, lons, radius_km))
+    if not candidates.size:
+        return candidates
+    distances = haversine_many(lat, lon, np.asarray(lats)[candidates], np.asarray(lons)[candidates])
+    return candidates[distances <= radius_km]
+
+
+def pairs_within_radius(origin_lats, origin_lons, lats, lons, radius_km, max_chunk_elements=MAX_CHUNK_ELEMENTS):
+    """
+    Return (origin_index, point_index) arrays for every pair within
+    radius_km, computing the many-to-many distance matrix in blocks of
+    origins by points so memory stays bounded by max_chunk_elements
+    whatever the input sizes.
+    """
+    origin_lats = np.radians(np.asarray(origin_lats, dtype=np.float64))
+    origin_lons = np.radians(np.asarray(origin_lons, dtype=np.float64))
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lats = np.cos(lats)
+    # Compare sin^2(d / 2R) instead of d, so no arcsin per element.
+    threshold = math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi) / 2) ** 2
+
+    # Whole rows of points when they fit, else tiles of the point axis too.
+    cols = max(1, min(lats.size, max_chunk_elements))
+    rows = max(1, max_chunk_elements // cols)
+    origin_parts, point_parts = [], []
+    for start in range(0, origin_lats.size, rows):
+        chunk_lats = origin_lats[start:start + rows, None]
+        chunk_lons = origin_lons[start:start + rows, None]
+        cos_chunk = np.cos(chunk_lats)
+        for col in range(0, lats.size, cols):
+            block = slice(col, col + cols)
+            a = (
+                np.sin((lats[block] - chunk_lats) / 2) ** 2
+                + cos_chunk * cos_lats[block] * np.sin((lons[block] - chunk_lons) / 2) ** 2
+            )
+            origin_index, point_index = np.nonzero(a <= threshold)
+            origin_parts.append(origin_index + start)
+            point_parts.append(point_index + col)
+
+    if not origin_parts:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+    return np.concatenate(origin_parts), np.concatenate(point_parts)
@@ -0,0 +1,98 @@
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .businesses import BusinessResolver
+from .models import Report
+from .serializers import ReportSerializer
+from .signals import reports_created
+
+CHUNK_SIZE = 1000
+
+
+class InvalidRow:
+    """Placeholder for an input line that could not be parsed."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def iter_ndjson(lines):
+    """Parse one JSON object per line, skipping blank lines."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield InvalidRow(f"Invalid JSON: {exc}")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _create_chunk(rows, resolver):
+    """Insert validated rows and their M2M links with bulk inserts in one transaction."""
+    reports = []
+    links = []
+    for data in rows:
+        data = dict(data)
+        links.append((data.pop("symptoms", []), data.pop("tags", [])))
+        report = Report(**data, business=resolver.resolve(data.get("business_name")))
+        # bulk_create skips save(), so derive the coordinates here.
+        report.set_coordinates()
+        reports.append(report)
+
+    SymptomLink = Report.symptoms.through
+    TagLink = Report.tags.through
+    with transaction.atomic():
+        Report.objects.bulk_create(reports)
+        symptom_links = []
+        tag_links = []
+        for report, (symptoms, tags) in zip(reports, links):
+            symptom_links.extend(SymptomLink(report_id=report.pk, symptom_id=pk) for pk in set(symptoms))
+            tag_links.extend(TagLink(report_id=report.pk, tag_id=pk) for pk in set(tags))
+        SymptomLink.objects.bulk_create(symptom_links)
+        TagLink.objects.bulk_create(tag_links)
+        transaction.on_commit(lambda: reports_created.send(sender=Report, reports=reports))
+    return len(reports)
+
+
+def ingest_reports(rows, chunk_size=CHUNK_SIZE):
+    """
+    Validate and create reports from an iterable of dicts, `chunk_size`
+    rows at a time. Invalid rows are skipped and reported by their
+    zero-based position; the valid rows of each chunk go in together.
+    Returns {"created": int, "errors": [{"row": int, "errors": ...}]}.
+    """
+    # One serializer validates every row, as ListSerializer does with its
+    # child, so the field set is built once rather than per row.
+    validator = ReportSerializer()
+    # Shared across chunks so each distinct name is resolved once per import.
+    resolver = BusinessResolver()
+    created = 0
+    errors = []
+    for chunk in _chunks(enumerate(rows), chunk_size):
+        valid = []
+        for index, row in chunk:
+            if isinstance(row, InvalidRow):
+                errors.append({"row": index, "errors": {"non_field_errors": [row.message]}})
+                continue
+            if not isinstance(row, dict):
+                errors.append({"row": index, "errors": {"non_field_errors": ["Expected a JSON object."]}})
+                continue
+            try:
+                valid.append(validator.run_validation(row))
+            except ValidationError as exc:
+                errors.append({"row": index, "errors": exc.detail})
+        if valid:
+            created += _create_chunk(valid, resolver)
+    return {"created": created, "errors": errors}
@@ -0,0 +1,96 @@
+"""
+values()-based read path for reports. Produces the same JSON shape as
+ReportSerializer without building a model instance or a serializer per
+row: one query for the report columns plus one per many-to-many field.
+"""
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .models import Report
+from .serializers import ReportSerializer
+
+REPORT_FIELDS = ReportSerializer.Meta.fields
+# Output field -> values() column for the plain columns.
+COLUMNS = {
+    "id": "id",
+    "title": "title",
+    "description": "description",
+    "location": "location",
+    "business_name": "business_name",
+    "business": "business_id",
+    "latitude": "latitude",
+    "longitude": "longitude",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+def parse_fields(param, allowed):
+    """
+    Turn a ?fields=a,b,c value into a list of field names, keeping the
+    order of `allowed`. An empty value means every field.
+    """
+    if not param:
+        return list(allowed)
+    requested = {name.strip() for name in param.split(",") if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Choose from: {', '.join(allowed)}")
+    return [name for name in allowed if name in requested]
+
+
+def format_datetime(value, tz=None):
+    """Match DRF's DateTimeField output: ISO 8601 in the current time zone, Z for UTC."""
+    if value is None:
+        return None
+    value = value.astimezone(tz or timezone.get_current_timezone()).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def related(report_ids, field):
+    """Map report id -> [(id, name), ...] for the symptoms or tags of those reports, in one query."""
+    through = getattr(Report, field).through
+    target = getattr(Report, field).field.related_model._meta.model_name
+    by_report = defaultdict(list)
+    for report_id, pk, name in through.objects.filter(report_id__in=report_ids).order_by(
+        f"{target}_id"
+    ).values_list("report_id", f"{target}_id", f"{target}__name"):
+        by_report[report_id].append((pk, name))
+    return by_report
+
+
+def report_values(queryset, fields):
+    """
+    The values() queryset behind `fields`. Always selects id and created_at
+    so cursor pagination can read its position from the rows.
+    """
+    columns = {"id", "created_at"}
+    columns.update(COLUMNS[name] for name in fields if name in COLUMNS)
+    return queryset.prefetch_related(None).values(*columns)
+
+
+def represent_reports(rows, fields):
+    """Turn report_values() rows into ReportSerializer-shaped dicts holding only `fields`."""
+    ids = [row["id"] for row in rows]
+    symptoms = related(ids, "symptoms") if {"symptoms", "symptoms_read"} & set(fields) else None
+    tags = related(ids, "tags") if {"tags", "tags_read"} & set(fields) else None
+    tz = timezone.get_current_timezone()
+    results = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            if name in DATETIME_FIELDS:
+                item[name] = format_datetime(row[name], tz)
+            elif name in COLUMNS:
+                item[name] = row[COLUMNS[name]]
+            elif name in ("symptoms", "tags"):
+                item[name] = [pk for pk, _ in (symptoms if name == "symptoms" else tags)[row["id"]]]
+            else:
+                pairs = (symptoms if name == "symptoms_read" else tags)[row["id"]]
+                item[name] = [{"id": pk, "name": label} for pk, label in pairs]
+        results.append(item)
+    return results
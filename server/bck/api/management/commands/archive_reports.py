@@ -0,0 +1,37 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.retention import archive_reports
+
+
+class Command(BaseCommand):
+    help = (
+        'Move reports older than REPORTS_RETENTION_DAYS out of the reports table, into the '
+        'archive table (served at /api/archived-reports/) or into gzipped NDJSON files'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.REPORTS_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--to-dir', default=settings.REPORTS_ARCHIVE_DIR,
+                            help='Write reports-YYYY-MM.ndjson.gz files here instead of the archive table')
+
+    def handle(self, *args, **options):
+        directory = options['to_dir']
+        if directory and not os.path.isdir(directory):
+            raise CommandError(f'{directory} is not a directory')
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        started = time.perf_counter()
+        archived = 0
+        for count in archive_reports(cutoff, options['batch_size'], directory):
+            archived += count
+            self.stdout.write(f"Archived {archived} reports")
+        self.stdout.write(
+            f"Archived {archived} reports created before {cutoff:%Y-%m-%d %H:%M} "
+            f"to {directory or 'the archive table'} in {time.perf_counter() - started:.1f}s"
+        )
@@ -0,0 +1,45 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.businesses import BusinessResolver
+from api.models import Report
+
+
+class Command(BaseCommand):
+    help = 'Link existing reports to Business rows by resolving their business_name'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        resolver = BusinessResolver()
+        pending = (
+            Report.objects.filter(business__isnull=True, business_name__isnull=False)
+            .exclude(business_name='')
+            .order_by('id')
+        )
+        started = time.perf_counter()
+        last_id = 0
+        linked = 0
+        while True:
+            batch = list(pending.filter(id__gt=last_id).values_list('id', 'business_name')[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            by_business = defaultdict(list)
+            for report_id, name in batch:
+                business = resolver.resolve(name)
+                if business is not None:
+                    by_business[business.pk].append(report_id)
+            with transaction.atomic():
+                for business_id, report_ids in by_business.items():
+                    linked += Report.objects.filter(pk__in=report_ids).update(business_id=business_id)
+            self.stdout.write(f"Linked {linked} reports (up to id {last_id})")
+
+        self.stdout.write(
+            f"Linked {linked} reports to {len({business.pk for business in resolver.cache.values()})} businesses "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
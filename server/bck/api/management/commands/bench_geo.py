@@ -0,0 +1,57 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.geo import haversine
+from api.geo_batch import haversine_many, pairs_within_radius, within_radius
+
+KATHMANDU = (27.7172, 85.3240)
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+class Command(BaseCommand):
+    help = 'Measure geo distance kernel throughput in point pairs per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+        parser.add_argument('--origins', type=int, default=100,
+                            help='Origins for the many-to-many kernel')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--scalar-limit', type=int, default=1_000_000,
+                            help='Skip the pure-Python loop above this many points')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        repeat = options['repeat']
+        self.stdout.write(f"{'kernel':<28} {'points':>9} {'pairs':>11} {'seconds':>9} {'Mpairs/s':>9}")
+        for size in options['sizes']:
+            lats = KATHMANDU[0] + rng.normal(0, 0.5, size)
+            lons = KATHMANDU[1] + rng.normal(0, 0.5, size)
+            origin_lats = KATHMANDU[0] + rng.normal(0, 0.5, options['origins'])
+            origin_lons = KATHMANDU[1] + rng.normal(0, 0.5, options['origins'])
+
+            if size <= options['scalar_limit']:
+                lat_list, lon_list = lats.tolist(), lons.tolist()
+                self.row('scalar haversine', size, size, best_of(1, lambda: [
+                    haversine(*KATHMANDU, lat, lon) for lat, lon in zip(lat_list, lon_list)
+                ]))
+            self.row('haversine_many', size, size, best_of(repeat, lambda: haversine_many(*KATHMANDU, lats, lons)))
+            self.row('within_radius (bbox + exact)', size, size,
+                     best_of(repeat, lambda: within_radius(*KATHMANDU, lats, lons, 5)))
+            pairs = options['origins'] * size
+            self.row(f'pairs_within_radius x{options["origins"]}', size, pairs, best_of(
+                repeat, lambda: pairs_within_radius(origin_lats, origin_lons, lats, lons, 5)
+            ))
+
+    def row(self, label, size, pairs, seconds):
+        self.stdout.write(f"{label:<28} {size:>9} {pairs:>11} {seconds:9.5f} {pairs / seconds / 1e6:9.2f}")
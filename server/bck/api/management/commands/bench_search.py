@@ -0,0 +1,85 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.models import Report
+from api.search import search_report_ids
+
+WORDS = [
+    "momo", "chowmein", "sekuwa", "dal", "bhat", "samosa", "lassi", "paneer", "chicken", "buff",
+    "diarrhea", "vomiting", "fever", "cramps", "nausea", "stale", "undercooked", "cold", "smelly", "dirty",
+    "kitchen", "water", "plate", "served", "ate", "after", "night", "lunch", "friends", "family",
+]
+BUSINESSES = ["Momo House", "Thakali Kitchen", "Newari Bhoj", "Everest Cafe", "Himalayan Tea Shop"]
+QUERIES = ["momo", "diarrhea", "undercooked chicken", "sekuwa cramps", "vomit"]
+MARKER = "[bench_search]"
+# Share of description words drawn from WORDS; the rest is filler, so a
+# query matches a realistic sliver of the table rather than every row.
+KEYWORD_RATE = 0.02
+FILLER = [f"filler{i}" for i in range(5000)]
+
+
+def text(rng, length):
+    return " ".join(rng.choice(WORDS) if rng.random() < KEYWORD_RATE else rng.choice(FILLER) for _ in range(length))
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic reports and compare full-text search latency with an icontains scan. '
+        'Inserts real rows: run it against a throwaway database (DB_NAME=...).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows afterwards')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        existing = Report.objects.filter(business_name__startswith=MARKER).count()
+        to_insert = max(options['rows'] - existing, 0)
+        started = time.perf_counter()
+        for start in range(0, to_insert, options['batch_size']):
+            Report.objects.bulk_create([
+                Report(
+                    title=text(rng, 3),
+                    description=text(rng, 25),
+                    business_name=f"{MARKER} {rng.choice(BUSINESSES)}",
+                )
+                for _ in range(min(options['batch_size'], to_insert - start))
+            ])
+        if to_insert:
+            self.stdout.write(f"Seeded {to_insert} reports in {time.perf_counter() - started:.1f}s")
+
+        # fts: ranked top 10 from the index. scan: newest 10 icontains matches,
+        # which can stop early on common words. scan all: every icontains
+        # match, the minimum work to rank or count results without an index.
+        self.stdout.write(f"{'query':<22} {'matches':>8} {'fts ms':>9} {'scan ms':>9} {'scan all ms':>12}")
+        for query in QUERIES:
+            fts = self.best_of(options['repeat'], lambda: search_report_ids(query, 10))
+            condition = Q()
+            for term in query.split():
+                condition &= Q(title__icontains=term) | Q(description__icontains=term) | Q(business_name__icontains=term)
+            matching = Report.objects.filter(condition)
+            scan = self.best_of(1, lambda: list(matching.order_by('-created_at').values_list('id', flat=True)[:10]))
+            matches = []
+            scan_all = self.best_of(1, lambda: matches.append(len(matching.values_list('id', flat=True))))
+            self.stdout.write(
+                f"{query:<22} {matches[0]:>8} {fts * 1000:9.2f} {scan * 1000:9.2f} {scan_all * 1000:12.2f}"
+            )
+
+        if options['cleanup']:
+            deleted, _ = Report.objects.filter(business_name__startswith=MARKER).delete()
+            self.stdout.write(f"Deleted {deleted} rows")
+
+    def best_of(self, repeat, fn):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
@@ -0,0 +1,95 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.lean import REPORT_FIELDS, report_values, represent_reports
+from api.models import Report, Symptom, Tag
+from api.renderers import FastJSONRenderer
+from api.serializers import ReportSerializer
+
+MARKER = "[bench_serialization]"
+SPARSE_FIELDS = ["id", "title", "latitude", "longitude", "created_at"]
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare report serialization throughput (rows/s, query to JSON bytes) of the '
+        'ModelSerializer path and the lean values() path. Inserts real rows: run it against '
+        'a throwaway database (DB_NAME=...).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows afterwards')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.seed(options['rows'], random.Random(options['seed']))
+        reports = Report.objects.filter(business_name__startswith=MARKER).order_by('-created_at', '-id')
+        page_size = options['page_size']
+        pages = [
+            reports[start:start + page_size]
+            for start in range(0, reports.count(), page_size)
+        ]
+        rows = sum(len(page) for page in pages)
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+
+        def serializer_path(renderer):
+            for page in pages:
+                renderer.render(ReportSerializer(page.prefetch_related('symptoms', 'tags'), many=True).data)
+
+        def lean_path(renderer, fields):
+            for page in pages:
+                renderer.render(represent_reports(list(report_values(page, fields)), fields))
+
+        self.stdout.write(f"{rows} rows in pages of {page_size}")
+        self.stdout.write(f"{'path':<36} {'seconds':>9} {'rows/s':>10}")
+        for label, run in [
+            ('ModelSerializer + JSONRenderer', lambda: serializer_path(stock)),
+            ('ModelSerializer + orjson', lambda: serializer_path(fast)),
+            ('lean values() + JSONRenderer', lambda: lean_path(stock, REPORT_FIELDS)),
+            ('lean values() + orjson', lambda: lean_path(fast, REPORT_FIELDS)),
+            (f'lean + orjson, fields={",".join(SPARSE_FIELDS)}', lambda: lean_path(fast, SPARSE_FIELDS)),
+        ]:
+            seconds = best_of(options['repeat'], run)
+            self.stdout.write(f"{label:<36} {seconds:9.3f} {rows / seconds:10.0f}")
+
+        if options['cleanup']:
+            deleted, _ = Report.objects.filter(business_name__startswith=MARKER).delete()
+            self.stdout.write(f"Deleted {deleted} rows")
+
+    def seed(self, count, rng):
+        existing = Report.objects.filter(business_name__startswith=MARKER).count()
+        if existing >= count:
+            return
+        symptoms = [Symptom.objects.get_or_create(name=f"bench symptom {i}")[0].pk for i in range(6)]
+        tags = [Tag.objects.get_or_create(name=f"bench tag {i}")[0].pk for i in range(4)]
+        reports = []
+        for i in range(count - existing):
+            lat, lon = 27.7172 + rng.gauss(0, 0.05), 85.3240 + rng.gauss(0, 0.05)
+            report = Report(title=f"Report {i}", description="Felt sick after eating " * 5,
+                            location=f"{lat:.6f},{lon:.6f}", business_name=f"{MARKER} {i % 20}")
+            report.set_coordinates()
+            reports.append(report)
+        Report.objects.bulk_create(reports, batch_size=1000)
+        Report.symptoms.through.objects.bulk_create([
+            Report.symptoms.through(report_id=report.pk, symptom_id=pk)
+            for report in reports for pk in rng.sample(symptoms, rng.randint(0, 3))
+        ], batch_size=1000)
+        Report.tags.through.objects.bulk_create([
+            Report.tags.through(report_id=report.pk, tag_id=pk)
+            for report in reports for pk in rng.sample(tags, rng.randint(0, 2))
+        ], batch_size=1000)
@@ -0,0 +1,47 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingest import CHUNK_SIZE, ingest_reports, iter_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Bulk import reports from a JSON array or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for stdin')
+        parser.add_argument('--format', choices=['json', 'ndjson'], default=None,
+                            help='Defaults to ndjson unless the path ends in .json')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--max-errors', type=int, default=20, help='Row errors to print')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('json' if path.endswith('.json') else 'ndjson')
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            started = time.perf_counter()
+            if fmt == 'json':
+                try:
+                    rows = json.load(stream)
+                except ValueError as exc:
+                    raise CommandError(f'Invalid JSON: {exc}')
+                if not isinstance(rows, list):
+                    raise CommandError('Expected a JSON array of reports')
+            else:
+                rows = iter_ndjson(stream)
+            result = ingest_reports(rows, chunk_size=options['chunk_size'])
+            elapsed = time.perf_counter() - started
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in result['errors'][:options['max_errors']]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        total = result['created'] + len(result['errors'])
+        self.stdout.write(
+            f"Imported {result['created']} of {total} rows in {elapsed:.2f}s "
+            f"({total / elapsed if elapsed else 0:.0f} rows/s), {len(result['errors'])} errors"
+        )
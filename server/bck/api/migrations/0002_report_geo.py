@@ -0,0 +1,70 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:31
+
+import math
+
+from django.db import migrations, models
+
+# Frozen copies of api.geo as of this migration, so later changes to the
+# grid or the parser don't change what it does.
+CELL_SIZE_DEG = 0.05
+
+
+def parse_location(location):
+    try:
+        if location and ',' in location:
+            lat, lon = map(float, location.split(','))
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return lat, lon
+        return None, None
+    except (ValueError, AttributeError, TypeError):
+        return None, None
+
+
+def cell_for(lat, lon):
+    if lat is None or lon is None:
+        return None
+    return f"{math.floor(lat / CELL_SIZE_DEG)}:{math.floor(lon / CELL_SIZE_DEG)}"
+
+
+def backfill_coordinates(apps, schema_editor):
+    Report = apps.get_model('api', 'Report')
+    batch = []
+    for report in Report.objects.only('id', 'location').iterator(chunk_size=1000):
+        report.latitude, report.longitude = parse_location(report.location)
+        report.geo_cell = cell_for(report.latitude, report.longitude)
+        batch.append(report)
+        if len(batch) >= 1000:
+            Report.objects.bulk_update(batch, ['latitude', 'longitude', 'geo_cell'])
+            batch = []
+    if batch:
+        Report.objects.bulk_update(batch, ['latitude', 'longitude', 'geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='geo_cell',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['geo_cell', 'created_at'], name='api_report_cell_created_idx'),
+        ),
+        migrations.RunPython(backfill_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_report_geo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['created_at', 'id'], name='api_report_created_id_idx'),
+        ),
+    ]
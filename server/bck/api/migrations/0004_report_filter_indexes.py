@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_report_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['business_name'], name='api_report_business_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['location'], name='api_report_location_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+from django.db import migrations
+
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(business_name, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_report_fts USING fts5(
+        title, description, business_name,
+        content='api_report', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER api_report_fts_insert AFTER INSERT ON api_report BEGIN
+        INSERT INTO api_report_fts(rowid, title, description, business_name)
+        VALUES (new.id, new.title, new.description, new.business_name);
+    END
+    """,
+    """
+    CREATE TRIGGER api_report_fts_delete AFTER DELETE ON api_report BEGIN
+        INSERT INTO api_report_fts(api_report_fts, rowid, title, description, business_name)
+        VALUES ('delete', old.id, old.title, old.description, old.business_name);
+    END
+    """,
+    """
+    CREATE TRIGGER api_report_fts_update AFTER UPDATE OF title, description, business_name ON api_report BEGIN
+        INSERT INTO api_report_fts(api_report_fts, rowid, title, description, business_name)
+        VALUES ('delete', old.id, old.title, old.description, old.business_name);
+        INSERT INTO api_report_fts(rowid, title, description, business_name)
+        VALUES (new.id, new.title, new.description, new.business_name);
+    END
+    """,
+    "INSERT INTO api_report_fts(api_report_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS api_report_fts_update",
+    "DROP TRIGGER IF EXISTS api_report_fts_delete",
+    "DROP TRIGGER IF EXISTS api_report_fts_insert",
+    "DROP TABLE IF EXISTS api_report_fts",
+]
+
+# A stored generated column, so ranking reads the vector instead of
+# re-parsing every matching row.
+POSTGRES_FORWARD = [
+    f"ALTER TABLE api_report ADD COLUMN search_document tsvector GENERATED ALWAYS AS ({POSTGRES_DOCUMENT}) STORED",
+    "CREATE INDEX api_report_search_idx ON api_report USING GIN (search_document)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS api_report_search_idx",
+    "ALTER TABLE api_report DROP COLUMN IF EXISTS search_document",
+]
+
+
+def run(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text index over title, description and business_name: an FTS5
+    table kept in sync by triggers on SQLite, a GIN-indexed generated
+    tsvector column on PostgreSQL. A later migration that makes SQLite rebuild api_report
+    drops the triggers and has to recreate them.
+    """
+
+    dependencies = [
+        ('api', '0004_report_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
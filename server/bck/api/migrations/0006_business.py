@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_report_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Business',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('normalized_name', models.CharField(max_length=255, unique=True)),
+                ('trigram_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'businesses',
+            },
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='business',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='api.business'),
+        ),
+        migrations.CreateModel(
+            name='BusinessTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='api.business')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trigram', 'business'), name='api_business_trigram_unique')],
+            },
+        ),
+    ]
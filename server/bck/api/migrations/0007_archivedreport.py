@@ -0,0 +1,62 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Rebuild the (still empty) table as one partitioned by created_at with the
+# same columns; the partition key has to be part of the primary key. The
+# Meta indexes are created after this runs, on the partitioned table.
+# archive_reports creates the monthly partitions.
+POSTGRES_PARTITION = [
+    "ALTER TABLE api_archivedreport RENAME TO api_archivedreport_plain",
+    """
+    CREATE TABLE api_archivedreport (
+        LIKE api_archivedreport_plain INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+    """,
+    "DROP TABLE api_archivedreport_plain",
+]
+
+
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRES_PARTITION:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    """
+    Archive table for reports past retention. Partitioned by created_at
+    month on PostgreSQL; a plain table elsewhere.
+    """
+
+    dependencies = [
+        ('api', '0006_business'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReport',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('location', models.CharField(blank=True, max_length=255, null=True)),
+                ('business_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('symptoms', models.JSONField(default=list)),
+                ('tags', models.JSONField(default=list)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('geo_cell', models.CharField(blank=True, max_length=20, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_reports', to='api.business')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'id'], name='api_archived_created_id_idx'), models.Index(fields=['business_name'], name='api_archived_business_idx'), models.Index(fields=['business'], name='api_archived_business_id_idx')],
+            },
+        ),
+        migrations.RunPython(partition, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from .geo import cell_for, parse_location
 
 class Symptom(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -12,18 +13,105 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+class Business(models.Model):
+    """
+    A restaurant or vendor that reports are about. Free-text business names
+    are resolved to one of these through the trigram index on ingest.
+    """
+    name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, unique=True)
+    trigram_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "businesses"
+
+    def __str__(self):
+        return self.name
+
+class BusinessTrigram(models.Model):
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="trigrams")
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["trigram", "business"], name="api_business_trigram_unique"),
+        ]
+
+    def __str__(self):
+        return self.trigram
+
 class Report(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     location = models.CharField(max_length=255, blank=True, null=True)
     business_name = models.CharField(max_length=255, blank=True, null=True)
+    business = models.ForeignKey(Business, on_delete=models.SET_NULL, blank=True, null=True, related_name="reports")
     symptoms = models.ManyToManyField(Symptom, blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Coordinates parsed from `location` once on save, plus the grid cell
+    # they fall in, so geo queries can filter in the database.
+    latitude = models.FloatField(blank=True, null=True, editable=False)
+    longitude = models.FloatField(blank=True, null=True, editable=False)
+    geo_cell = models.CharField(max_length=20, blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["geo_cell", "created_at"], name="api_report_cell_created_idx"),
+            models.Index(fields=["created_at", "id"], name="api_report_created_id_idx"),
+            models.Index(fields=["business_name"], name="api_report_business_idx"),
+            models.Index(fields=["location"], name="api_report_location_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
+    def set_coordinates(self):
+        self.latitude, self.longitude = parse_location(self.location)
+        self.geo_cell = cell_for(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.set_coordinates()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "location" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "latitude", "longitude", "geo_cell"}
+        super().save(*args, **kwargs)
+
+class ArchivedReport(models.Model):
+    """
+    A report moved out of api_report by the archive_reports command once
+    it is older than REPORTS_RETENTION_DAYS. Symptoms and tags are kept
+    inline as [{"id": ..., "name": ...}] so nothing else has to be kept
+    around for them. On PostgreSQL the table is partitioned by created_at
+    month (see migration 0007).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    location = models.CharField(max_length=255, blank=True, null=True)
+    business_name = models.CharField(max_length=255, blank=True, null=True)
+    business = models.ForeignKey(
+        Business, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        blank=True, null=True, related_name="archived_reports",
+    )
+    symptoms = models.JSONField(default=list)
+    tags = models.JSONField(default=list)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    geo_cell = models.CharField(max_length=20, blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="api_archived_created_id_idx"),
+            models.Index(fields=["business_name"], name="api_archived_business_idx"),
+            models.Index(fields=["business"], name="api_archived_business_id_idx"),
+        ]
 
+    def __str__(self):
+        return self.title
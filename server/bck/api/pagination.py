@@ -0,0 +1,11 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ReportCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), newest first. Pages are stable
+    while new reports arrive and every page is an index range scan, however
+    deep the client has scrolled.
+    """
+    page_size = 10
+    ordering = ("-created_at", "-id")
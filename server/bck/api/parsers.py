@@ -0,0 +1,16 @@
+from rest_framework.parsers import BaseParser
+
+from .ingest import iter_ndjson
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON lazily, one object per line, so a large
+    upload is validated and inserted as it is read.
+    """
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return iter(())
+        return iter_ndjson(stream)
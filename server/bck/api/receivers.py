@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .models import Symptom, Tag
+
+
+@receiver([post_save, post_delete], sender=Symptom)
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_catalog_on_write(sender, **kwargs):
+    invalidate_catalog(sender)
@@ -0,0 +1,27 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stock renderer
+    orjson = None
+
+if orjson is not None:
+    # Datetimes go through DRF's encoder so they keep its "Z" suffix.
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    encode_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson when it is installed. Output matches the
+    stock renderer's compact UTF-8 JSON; indented (browsable or
+    ?indent=) responses and installs without orjson use the stock path.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
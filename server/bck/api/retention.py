@@ -0,0 +1,116 @@
+"""
+Report retention. archive_reports() moves reports created before a cutoff
+out of api_report in batches, into ArchivedReport or into gzipped NDJSON
+files, so the hot table and its indexes only hold recent reports however
+long the service has been running.
+"""
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, models, transaction
+
+from .lean import REPORT_FIELDS, related, report_values, represent_reports
+from .models import ArchivedReport, Report
+
+ARCHIVE_COLUMNS = [
+    "id", "title", "description", "location", "business_name", "business_id",
+    "latitude", "longitude", "geo_cell", "created_at", "updated_at",
+]
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(start):
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def ensure_partitions(months):
+    """Create the ArchivedReport partitions for these month starts (PostgreSQL only)."""
+    if connection.vendor != "postgresql":
+        return
+    table = ArchivedReport._meta.db_table
+    with connection.cursor() as cursor:
+        for start in sorted(set(months)):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {table}_p{start:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_month(start).isoformat()}')"
+            )
+
+
+def archive_rows(ids):
+    """Unsaved ArchivedReport instances for the reports with these ids."""
+    symptoms = related(ids, "symptoms")
+    tags = related(ids, "tags")
+    return [
+        ArchivedReport(
+            **row,
+            symptoms=[{"id": pk, "name": name} for pk, name in symptoms[row["id"]]],
+            tags=[{"id": pk, "name": name} for pk, name in tags[row["id"]]],
+        )
+        for row in Report.objects.filter(pk__in=ids).order_by("id").values(*ARCHIVE_COLUMNS)
+    ]
+
+
+def write_archive_files(ids, directory):
+    """
+    Append the reports with these ids to reports-YYYY-MM.ndjson.gz in
+    `directory`, one line per report in the /api/reports/export/ shape.
+    Each call adds a gzip member, which gzip readers concatenate.
+    """
+    rows = list(report_values(Report.objects.filter(pk__in=ids).order_by("id"), REPORT_FIELDS))
+    by_month = defaultdict(list)
+    for row, item in zip(rows, represent_reports(rows, REPORT_FIELDS)):
+        by_month[month_start(row["created_at"])].append(json.dumps(item).encode() + b"\n")
+    for month, lines in by_month.items():
+        with open(os.path.join(directory, f"reports-{month:%Y-%m}.ndjson.gz"), "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+                out.writelines(lines)
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def delete_reports(ids):
+    """
+    Delete reports and the rows that reference them without loading the
+    reports. Archived reports are older than any cached nearby tile, so
+    the per-instance post_delete receivers would have nothing to do.
+    """
+    for relation in Report._meta.get_fields(include_hidden=True):
+        if not (relation.one_to_many and relation.auto_created):
+            continue
+        dependents = relation.related_model._base_manager.filter(**{f"{relation.field.name}__in": ids})
+        if relation.on_delete is models.CASCADE:
+            dependents.delete()
+        elif relation.on_delete is models.SET_NULL:
+            dependents.update(**{relation.field.name: None})
+    Report._base_manager.filter(pk__in=ids)._raw_delete(connection.alias)
+
+
+def archive_reports(cutoff, batch_size=1000, directory=None):
+    """
+    Move reports created before `cutoff` out of api_report, oldest first,
+    and yield the number moved per batch. Into ArchivedReport each batch
+    is copied and deleted in one transaction; into files under
+    `directory` a batch is written and synced before it is deleted, so a
+    crash in between can repeat a batch in a file but never lose one.
+    """
+    pending = Report.objects.filter(created_at__lt=cutoff).order_by("created_at", "id")
+    while True:
+        batch = list(pending.values_list("id", "created_at")[:batch_size])
+        if not batch:
+            return
+        ids = [pk for pk, _ in batch]
+        if directory is not None:
+            write_archive_files(ids, directory)
+        with transaction.atomic():
+            if directory is None:
+                ensure_partitions(month_start(created_at) for _, created_at in batch)
+                ArchivedReport.objects.bulk_create(archive_rows(ids))
+            delete_reports(ids)
+        yield len(ids)
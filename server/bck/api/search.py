@@ -0,0 +1,50 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Report
+
+# Title matches outrank business name matches, which outrank descriptions.
+# On PostgreSQL the same weighting is baked into the generated
+# api_report.search_document column (see migration 0005).
+SQLITE_RANK = "bm25(api_report_fts, 10.0, 1.0, 5.0)"
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query.lower())
+
+
+def search_report_ids(query, limit, offset=0):
+    """
+    Return the ids of reports matching every word of `query` (as a
+    prefix), best match first, using the backend's full-text index.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        sql = (
+            "SELECT rowid FROM api_report_fts WHERE api_report_fts MATCH %s "
+            f"ORDER BY {SQLITE_RANK}, rowid DESC LIMIT %s OFFSET %s"
+        )
+        params = [match, limit, offset]
+    elif connection.vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        sql = (
+            "SELECT id FROM api_report, to_tsquery('english', %s) query "
+            "WHERE search_document @@ query "
+            "ORDER BY ts_rank(search_document, query) DESC, id DESC LIMIT %s OFFSET %s"
+        )
+        params = [tsquery, limit, offset]
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(description__icontains=term) | Q(business_name__icontains=term)
+        return list(
+            Report.objects.filter(condition).order_by("-created_at", "-id").values_list("id", flat=True)[offset:offset + limit]
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
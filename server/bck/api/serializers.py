@@ -1,5 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Report, Symptom, Tag
+from .businesses import resolve_business
+from .catalog import get_catalog_ids
+from .models import ArchivedReport, Report, Symptom, Tag
+from .signals import reports_created
 
 class SymptomSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,14 +15,34 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ["id", "name"]
 
+class CatalogPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Validates IDs against the cached catalog ID set instead of querying
+    for each one, and returns the bare ID (which is all .set() needs). An
+    ID missing from the set is looked up once, as the cached set may
+    predate an entry added in another process.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        queryset = self.get_queryset()
+        if pk not in get_catalog_ids(queryset.model) and not queryset.filter(pk=pk).exists():
+            self.fail("does_not_exist", pk_value=data)
+        return pk
+
 class ReportSerializer(serializers.ModelSerializer):
     # Write fields: expect lists of IDs for ManyToMany
-    symptoms = serializers.PrimaryKeyRelatedField(
+    symptoms = CatalogPrimaryKeyRelatedField(
         queryset=Symptom.objects.all(),
         many=True,
         required=False
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = CatalogPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
         required=False
@@ -36,23 +60,30 @@ class ReportSerializer(serializers.ModelSerializer):
             "description",
             "location",
             "business_name",
+            "business",
             "symptoms",       # write field (expects IDs)
             "tags",           # write field (expects IDs)
             "symptoms_read",  # read-only nested data
             "tags_read",      # read-only nested data
+            "latitude",
+            "longitude",
             "created_at",
             "updated_at"
         ]
-        read_only_fields = ["created_at", "updated_at", "symptoms_read", "tags_read"]
+        read_only_fields = [
+            "created_at", "updated_at", "symptoms_read", "tags_read", "latitude", "longitude", "business"
+        ]
 
     def create(self, validated_data):
         symptoms_data = validated_data.pop("symptoms", [])
         tags_data = validated_data.pop("tags", [])
+        validated_data["business"] = resolve_business(validated_data.get("business_name"))
         report = Report.objects.create(**validated_data)
         if symptoms_data:
             report.symptoms.set(symptoms_data)
         if tags_data:
             report.tags.set(tags_data)
+        transaction.on_commit(lambda: reports_created.send(sender=Report, reports=[report]))
         return report
 
     def update(self, instance, validated_data):
@@ -63,7 +94,9 @@ class ReportSerializer(serializers.ModelSerializer):
         instance.title = validated_data.get("title", instance.title)
         instance.description = validated_data.get("description", instance.description)
         instance.location = validated_data.get("location", instance.location)
-        instance.business_name = validated_data.get("business_name", instance.business_name)
+        if "business_name" in validated_data and validated_data["business_name"] != instance.business_name:
+            instance.business_name = validated_data["business_name"]
+            instance.business = resolve_business(instance.business_name)
         instance.save()
 
         # Update ManyToMany fields if provided
@@ -73,3 +106,20 @@ class ReportSerializer(serializers.ModelSerializer):
             instance.tags.set(tags_data)
 
         return instance
+
+class ArchivedReportSerializer(serializers.ModelSerializer):
+    """Archived reports in the ReportSerializer shape, plus archived_at."""
+    symptoms = serializers.SerializerMethodField()
+    tags = serializers.SerializerMethodField()
+    symptoms_read = serializers.JSONField(source="symptoms", read_only=True)
+    tags_read = serializers.JSONField(source="tags", read_only=True)
+
+    class Meta:
+        model = ArchivedReport
+        fields = ReportSerializer.Meta.fields + ["archived_at"]
+
+    def get_symptoms(self, obj):
+        return [symptom["id"] for symptom in obj.symptoms]
+
+    def get_tags(self, obj):
+        return [tag["id"] for tag in obj.tags]
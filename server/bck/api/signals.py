@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent once the transaction that created the reports has committed, with
+# `reports`: the list of new Report instances. Bulk paths send one signal
+# per batch rather than one per row.
+reports_created = Signal()
@@ -0,0 +1,306 @@
+import csv
+import io
+import json
+import random
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.businesses import BusinessResolver
+from api.geo import haversine
+from api.geo_batch import equirectangular_many, haversine_many, pairs_within_radius, within_radius
+from api.models import ArchivedReport, Business, Report, Symptom, Tag
+from api.retention import archive_reports
+from api.serializers import ReportSerializer
+
+
+class QueryCountTests(TestCase):
+    """
+    Pin the number of SQL queries per read endpoint so that it stays
+    constant however many reports are on the page.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.symptoms = [Symptom.objects.create(name=f"symptom {i}") for i in range(3)]
+        cls.tags = [Tag.objects.create(name=f"tag {i}") for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def create_reports(self, count, location='27.7172,85.3240'):
+        for i in range(count):
+            report = Report.objects.create(title=f"report {i}", description='d', location=location)
+            report.symptoms.set(self.symptoms)
+            report.tags.set(self.tags)
+
+    def test_report_list(self):
+        for count in (1, 10):
+            Report.objects.all().delete()
+            self.create_reports(count)
+            # page, symptoms prefetch, tags prefetch
+            with self.assertNumQueries(3):
+                response = self.client.get('/api/reports/')
+            self.assertEqual(len(response.json()['results']), count)
+
+    def test_report_detail(self):
+        self.create_reports(1)
+        report = Report.objects.get()
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/reports/{report.pk}/')
+        self.assertEqual(len(response.json()['symptoms_read']), 3)
+        self.assertEqual(self.client.get('/api/reports/abc/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/reports/{report.pk + 1}/').status_code, 404)
+
+    def test_report_list_matches_serializer(self):
+        self.create_reports(3)
+        expected = ReportSerializer(Report.objects.order_by('-created_at', '-id'), many=True).data
+        response = self.client.get('/api/reports/')
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected, cls=JSONEncoder)))
+
+        # Sparse fields skip the symptom and tag queries.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/reports/', {'fields': 'id,title'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title'})
+        self.assertEqual(self.client.get('/api/reports/', {'fields': 'nope'}).status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        symptom = Symptom.objects.create(name='vomiting')
+        business = BusinessResolver().resolve('Momo Hut')
+        self.reports = [
+            Report.objects.create(title=f"report {i}", description='d', business_name='Momo Hut', business=business)
+            for i in range(3)
+        ]
+        self.reports[0].symptoms.set([symptom])
+
+    def export(self, **params):
+        response = self.client.get('/api/reports/export/', params)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [report.pk for report in self.reports])
+        self.assertEqual(rows[0]['business'], self.reports[0].business_id)
+        self.assertEqual(rows[0]['symptoms_read'], [{'id': self.reports[0].symptoms.get().pk, 'name': 'vomiting'}])
+
+    def test_csv(self):
+        response, body = self.export(fmt='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([int(row['id']) for row in rows], [report.pk for report in self.reports])
+        self.assertEqual(rows[0]['business'], str(self.reports[0].business_id))
+        self.assertEqual((rows[0]['symptoms'], rows[1]['symptoms']), ('vomiting', ''))
+
+    def test_resume_after_id(self):
+        for fmt, parse in (('ndjson', lambda body: [json.loads(line) for line in body.splitlines()]),
+                           ('csv', lambda body: list(csv.DictReader(io.StringIO(body))))):
+            _, body = self.export(fmt=fmt, after_id=self.reports[0].pk)
+            self.assertEqual([int(row['id']) for row in parse(body)], [report.pk for report in self.reports[1:]])
+        self.assertEqual(self.client.get('/api/reports/export/', {'after_id': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/reports/export/', {'fmt': 'xml'}).status_code, 400)
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        Symptom.objects.create(name='nausea')
+
+    def test_etag_revalidation(self):
+        response = self.client.get('/api/symptoms/')
+        self.assertEqual(response.json(), [{'id': Symptom.objects.get().pk, 'name': 'nausea'}])
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/symptoms/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+
+        # A write changes the ETag, so the stale one gets the new list.
+        Symptom.objects.create(name='fever')
+        response = self.client.get('/api/symptoms/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()), 2)
+        # Tags have their own entry.
+        self.assertEqual(self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_id_missing_from_cached_set(self):
+        report = {'title': 'a', 'description': 'd', 'symptoms': [Symptom.objects.get().pk]}
+        self.assertEqual(self.client.post('/api/reports/', report, format='json').status_code, 201)
+        # Added without a signal, as if by another process with its own cache.
+        added = Symptom.objects.bulk_create([Symptom(name='fever')])[0]
+        response = self.client.post('/api/reports/', {**report, 'symptoms': [added.pk]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/reports/', {**report, 'symptoms': [added.pk + 1]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkIngestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.symptom = Symptom.objects.create(name='vomiting')
+
+    def post(self, body, content_type='application/json'):
+        return self.client.post('/api/reports/bulk/', body, content_type=content_type)
+
+    def test_bulk(self):
+        rows = [
+            {'title': 'a', 'description': 'd', 'location': '27.7,85.3', 'symptoms': [self.symptom.pk]},
+            {'title': 'b', 'description': 'd'},
+        ]
+        response = self.post(json.dumps(rows))
+        self.assertEqual((response.status_code, response.json()), (201, {'created': 2, 'errors': []}))
+        self.assertEqual(Report.objects.get(title='a').symptoms.get(), self.symptom)
+
+        # Good rows go in, bad ones come back by position.
+        response = self.post('{"title": "c", "description": "d"}\n[1]\n{"title": "e"}\nnot json\n', 'application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual([error['row'] for error in response.json()['errors']], [1, 2, 3])
+        self.assertIn('description', response.json()['errors'][1]['errors'])
+
+        response = self.post('[{"title": "f"}]')
+        self.assertEqual((response.status_code, response.json()['created']), (400, 0))
+        for body in ('null', '', '{}', '"rows"'):
+            self.assertEqual(self.post(body).status_code, 400, body)
+        # Nothing to create is not an error.
+        response = self.post('[]')
+        self.assertEqual((response.status_code, response.json()), (201, {'created': 0, 'errors': []}))
+        self.assertEqual(Report.objects.count(), 3)
+
+
+class GeoBatchTests(SimpleTestCase):
+    """The NumPy kernels must agree with the scalar haversine."""
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.origins = [(27.7172 + rng.gauss(0, 0.1), 85.3240 + rng.gauss(0, 0.1)) for _ in range(20)]
+        self.points = [(27.7172 + rng.gauss(0, 0.1), 85.3240 + rng.gauss(0, 0.1)) for _ in range(500)]
+        # Far-away and edge-of-range points as well.
+        self.points += [(-33.86, 151.2), (89.9, 0.0), (0.0, 179.99), (0.0, -179.99)]
+        self.lats = [lat for lat, _ in self.points]
+        self.lons = [lon for _, lon in self.points]
+
+    def test_haversine_many_matches_scalar(self):
+        for lat, lon in self.origins + [(0.0, 180.0)]:
+            distances = haversine_many(lat, lon, self.lats, self.lons)
+            for distance, (point_lat, point_lon) in zip(distances, self.points):
+                self.assertAlmostEqual(distance, haversine(lat, lon, point_lat, point_lon), delta=1e-6)
+
+    def test_equirectangular_is_close_at_city_scale(self):
+        lat, lon = self.origins[0]
+        exact = haversine_many(lat, lon, self.lats[:500], self.lons[:500])
+        approx = equirectangular_many(lat, lon, self.lats[:500], self.lons[:500])
+        for e, a in zip(exact, approx):
+            self.assertAlmostEqual(a, e, delta=max(0.01 * e, 1e-6))
+
+    def test_within_radius_matches_scalar(self):
+        for lat, lon in self.origins:
+            expected = {
+                i for i, (point_lat, point_lon) in enumerate(self.points)
+                if haversine(lat, lon, point_lat, point_lon) <= 5
+            }
+            self.assertEqual(set(within_radius(lat, lon, self.lats, self.lons, 5).tolist()), expected)
+
+    def test_pairs_within_radius_matches_scalar_in_small_chunks(self):
+        expected = {
+            (i, j)
+            for i, (lat, lon) in enumerate(self.origins)
+            for j, (point_lat, point_lon) in enumerate(self.points)
+            if haversine(lat, lon, point_lat, point_lon) <= 5
+        }
+        # Whole rows of points per chunk, then fewer elements than points.
+        for max_chunk_elements in (1000, 100, 1):
+            origin_index, point_index = pairs_within_radius(
+                [lat for lat, _ in self.origins], [lon for _, lon in self.origins],
+                self.lats, self.lons, 5, max_chunk_elements=max_chunk_elements,
+            )
+            self.assertEqual(set(zip(origin_index.tolist(), point_index.tolist())), expected)
+            self.assertEqual(len(origin_index), len(expected))
+
+
+class SearchTests(TestCase):
+    def search(self, **params):
+        return APIClient().get('/api/reports/search/', params)
+
+    def test_search(self):
+        in_description = Report.objects.create(title='Upset stomach', description='After the momos at lunch')
+        in_title = Report.objects.create(title='Undercooked momos', description='Raw inside')
+        Report.objects.create(title='Stale chowmein', description='Smelled off', business_name='Momo Hut')
+        Report.objects.create(title='Cold tea', description='Nothing else')
+
+        response = self.search(q='MOMO')
+        results = response.json()['results']
+        self.assertEqual(len(results), 3)
+        # A title match ranks above a description match.
+        titles = [report['title'] for report in results]
+        self.assertLess(titles.index(in_title.title), titles.index(in_description.title))
+        # Every word has to match, each as a prefix.
+        self.assertEqual([r['title'] for r in self.search(q='stale mom').json()['results']], ['Stale chowmein'])
+
+        # Edits and deletes reach the index.
+        in_description.description = 'After the dumplings'
+        in_description.save()
+        in_title.delete()
+        self.assertEqual([r['title'] for r in self.search(q='momo').json()['results']], ['Stale chowmein'])
+
+        page = self.search(q='st', limit=1).json()
+        self.assertEqual(len(page['results']), 1)
+        self.assertIn('offset=1', page['next'])
+        self.assertEqual(self.search(q=' ').status_code, 400)
+
+
+class BusinessTests(TestCase):
+    def test_names_resolve_to_one_business(self):
+        resolver = BusinessResolver()
+        kitchen = resolver.resolve('Thakali Kitchen')
+        self.assertEqual(resolver.resolve('  thakali   KITCHEN!'), kitchen)
+        self.assertEqual(BusinessResolver().resolve('Thakali Kitchn'), kitchen)
+        self.assertNotEqual(resolver.resolve('Everest Cafe'), resolver.resolve('Everest Cafe & Bar'))
+        self.assertIsNone(resolver.resolve(' '))
+        # Memoized: a repeat name costs no query.
+        with self.assertNumQueries(0):
+            resolver.resolve('Thakali Kitchen')
+
+    def test_reports_link_to_businesses(self):
+        client = APIClient()
+        client.post('/api/reports/', {'title': 'a', 'description': 'd', 'business_name': 'Momo Hut'}, format='json')
+        client.post('/api/reports/bulk/', [{'title': 'b', 'description': 'd', 'business_name': 'momo hut.'}], format='json')
+        Report.objects.create(title='c', description='d', business_name='Momo  Hutt')
+        Report.objects.create(title='e', description='d', business_name='Yak Restaurant')
+        call_command('backfill_businesses', stdout=io.StringIO())
+
+        momo = Business.objects.get(normalized_name='momo hut')
+        self.assertEqual(Business.objects.count(), 2)
+        response = client.get('/api/reports/', {'business': momo.pk, 'fields': 'title'})
+        self.assertEqual(sorted(report['title'] for report in response.json()['results']), ['a', 'b', 'c'])
+
+
+class ArchiveTests(TestCase):
+    def test_archive_moves_old_reports(self):
+        symptom = Symptom.objects.create(name='vomiting')
+        reports = [Report.objects.create(title=f"report {i}", description='d', location='27.7,85.3') for i in range(3)]
+        reports[0].symptoms.set([symptom])
+        Report.objects.filter(pk__in=[reports[0].pk, reports[1].pk]).update(
+            created_at=timezone.now() - timedelta(days=400)
+        )
+        expected = json.loads(json.dumps(ReportSerializer(Report.objects.get(pk=reports[0].pk)).data, cls=JSONEncoder))
+
+        self.assertEqual(sum(archive_reports(timezone.now() - timedelta(days=365), batch_size=1)), 2)
+        self.assertEqual(list(Report.objects.values_list('pk', flat=True)), [reports[2].pk])
+        self.assertEqual(ArchivedReport.objects.count(), 2)
+        self.assertFalse(Report.symptoms.through.objects.exists())
+
+        archived = APIClient().get(f'/api/archived-reports/{reports[0].pk}/').json()
+        self.assertIsNotNone(archived.pop('archived_at'))
+        self.assertEqual(archived, expected)
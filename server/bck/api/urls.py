@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ReportViewSet, SymptomViewSet, TagViewSet
+from .views import ArchivedReportViewSet, ReportViewSet, SymptomViewSet, TagViewSet
 
 
 # Create a router and register our viewsets with it.
@@ -8,6 +8,7 @@ router = DefaultRouter()
 router.register(r"reports", ReportViewSet, basename="report")
 router.register(r"symptoms", SymptomViewSet, basename="symptom")
 router.register(r"tags", TagViewSet, basename="tag")
+router.register(r"archived-reports", ArchivedReportViewSet, basename="archived-report")
 
 
 # The API URLs are now determined automatically by the router.
@@ -1,9 +1,48 @@
-from rest_framework import viewsets, permissions
+from collections.abc import Iterator
+from urllib.parse import urlencode
+
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Report, Symptom, Tag
-from .serializers import ReportSerializer, SymptomSerializer, TagSerializer
+from .catalog import get_catalog
+from .export import iter_csv, iter_ndjson
+from .ingest import ingest_reports
+from .lean import REPORT_FIELDS, parse_fields, report_values, represent_reports
+from .models import ArchivedReport, Report, Symptom, Tag
+from .pagination import ReportCursorPagination
+from .parsers import NDJSONParser
+from .search import search_report_ids
+from .serializers import ArchivedReportSerializer, ReportSerializer, SymptomSerializer, TagSerializer
+
+EXPORT_CHUNK_SIZE = 1000
+SEARCH_PAGE_SIZE = 10
+SEARCH_MAX_PAGE_SIZE = 100
 
-class SymptomViewSet(viewsets.ReadOnlyModelViewSet):
+class CatalogListMixin:
+    """
+    Serves the list from the catalog cache with ETag and Last-Modified
+    headers, answering matching conditional GETs with 304 and no query.
+    """
+
+    def list(self, request, *args, **kwargs):
+        entry = get_catalog(self.queryset.model, self.serializer_class)
+        last_modified = int(entry["last_modified"].timestamp())
+        response = get_conditional_response(
+            request._request, etag=entry["etag"], last_modified=last_modified
+        )
+        if response is None:
+            response = Response(entry["data"])
+        response["ETag"] = quote_etag(entry["etag"])
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+class SymptomViewSet(CatalogListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for listing Symptoms.
     ReadOnly since symptoms likely don't change often.
@@ -13,7 +52,7 @@ class SymptomViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]  # Allow anyone to view symptoms
     pagination_class = None  # No pagination for symptoms list
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for listing Tags.
     """
@@ -26,11 +65,109 @@ class ReportViewSet(viewsets.ModelViewSet):
     """
     ViewSet for creating, listing, retrieving, updating, and deleting Reports.
     """
-    queryset = Report.objects.all().order_by("-created_at")  # Show newest first
+    queryset = Report.objects.prefetch_related("symptoms", "tags").order_by("-created_at", "-id")  # Show newest first
     serializer_class = ReportSerializer
     permission_classes = [permissions.AllowAny]  # Allow anyone to create/view reports for now
+    pagination_class = ReportCursorPagination
+    lookup_value_regex = r"\d+"  # Anything else is a 404 before it reaches a query
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ["tags", "symptoms", "location", "business_name"]  # Allow filtering on these fields
+    filterset_fields = ["tags", "symptoms", "location", "business_name", "business"]  # Allow filtering on these fields
+
+    def list(self, request, *args, **kwargs):
+        """
+        Reads go through the values()-based lean path rather than the
+        serializer. ?fields=id,title,... limits the fields returned.
+        """
+        try:
+            fields = parse_fields(request.query_params.get("fields"), REPORT_FIELDS)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        rows = report_values(self.filter_queryset(self.get_queryset()), fields)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(represent_reports(list(rows), fields))
+        return self.get_paginated_response(represent_reports(page, fields))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            fields = parse_fields(request.query_params.get("fields"), REPORT_FIELDS)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        rows = list(report_values(self.filter_queryset(self.get_queryset()).filter(pk=kwargs["pk"]), fields))
+        if not rows:
+            raise Http404
+        return Response(represent_reports(rows, fields)[0])
+
+    @action(detail=False, methods=["post"], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        Create many reports from a JSON array or an NDJSON stream
+        (Content-Type: application/x-ndjson). Rows are validated and
+        inserted in chunks; invalid rows are returned by position.
+        """
+        rows = request.data
+        # A JSON array parses to a list, an NDJSON stream to an iterator.
+        if not isinstance(rows, (list, Iterator)):
+            return Response({"error": "Expected a JSON array or NDJSON"}, status=status.HTTP_400_BAD_REQUEST)
+        result = ingest_reports(rows)
+        # Only a body whose every row was rejected is a bad request; an
+        # empty array creates nothing but is fine.
+        if result["errors"] and not result["created"]:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Full-text search over title, description and business_name with
+        ?q=, best match first. Paginate with ?offset= and ?limit=.
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            offset = max(int(request.query_params.get("offset", 0)), 0)
+            limit = min(max(int(request.query_params.get("limit", SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"error": "offset and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = search_report_ids(query, limit + 1, offset)
+        has_next = len(ids) > limit
+        ids = ids[:limit]
+        reports = self.get_queryset().in_bulk(ids)
+        results = self.get_serializer([reports[pk] for pk in ids if pk in reports], many=True).data
+
+        next_url = None
+        if has_next:
+            next_url = request.build_absolute_uri(
+                f"{request.path}?{urlencode({'q': query, 'offset': offset + limit, 'limit': limit})}"
+            )
+        return Response({"next": next_url, "results": results})
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream every matching report, oldest first, as NDJSON (default) or
+        CSV with ?fmt=csv. Pass ?after_id=<last id seen> to resume.
+        """
+        fmt = request.query_params.get("fmt", "ndjson")
+        if fmt not in ("ndjson", "csv"):
+            return Response({"error": "fmt must be ndjson or csv"}, status=status.HTTP_400_BAD_REQUEST)
+        reports = self.filter_queryset(self.get_queryset()).order_by("id")
+        after_id = request.query_params.get("after_id")
+        if after_id:
+            try:
+                reports = reports.filter(id__gt=int(after_id))
+            except ValueError:
+                return Response({"error": "after_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        reports = reports.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        if fmt == "csv":
+            response = StreamingHttpResponse(iter_csv(reports), content_type="text/csv")
+            response["Content-Disposition"] = 'attachment; filename="reports.csv"'
+        else:
+            response = StreamingHttpResponse(iter_ndjson(reports), content_type="application/x-ndjson")
+        return response
 
     # If you want to customize create/update behavior, you can override:
     # def perform_create(self, serializer):
@@ -38,3 +175,22 @@ class ReportViewSet(viewsets.ModelViewSet):
 
     # def perform_update(self, serializer):
     #     serializer.save()
+
+class ArchivedReportViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Reports moved out of the reports table by archive_reports. Filter with
+    ?created_at__gte= and ?created_at__lt= (on PostgreSQL only the
+    matching monthly partitions are read), business_name, business or
+    geo_cell.
+    """
+    queryset = ArchivedReport.objects.order_by("-created_at", "-id")
+    serializer_class = ArchivedReportSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = ReportCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        "created_at": ["gte", "lt"],
+        "business_name": ["exact"],
+        "business": ["exact"],
+        "geo_cell": ["exact"],
+    }
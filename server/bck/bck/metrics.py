@@ -0,0 +1,123 @@
+"""
+In-process metrics: labelled counters and histograms, rendered in the
+Prometheus text exposition format. Each process keeps its own registry, so
+scrape every worker (or run one) to see the whole picture.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}
+        self.counters = {}
+        self.histograms = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def total(self, name, **labels):
+        """Sum of a histogram's observations, or 0 if it has none yet."""
+        histogram = self.histograms.get((name, tuple(sorted(labels.items()))))
+        return histogram.sum if histogram else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+            seen = set()
+            for (name, labels), value in counters:
+                if name not in seen:
+                    seen.add(name)
+                    lines.extend(_header(name, 'counter', self.help.get(name)))
+                lines.append(f'{name}{_labels(labels)} {value}')
+            for (name, labels), histogram in histograms:
+                if name not in seen:
+                    seen.add(name)
+                    lines.extend(_header(name, 'histogram', self.help.get(name)))
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _header(name, kind, text):
+    if text:
+        yield f'# HELP {name} {text}'
+    yield f'# TYPE {name} {kind}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+registry = Registry()
+registry.describe('http_requests_total', 'Requests served, by view, method and status.')
+registry.describe('http_request_duration_seconds', 'Wall time from middleware entry to response.')
+registry.describe('http_render_duration_seconds', 'Time spent rendering (serializing) the response body.')
+registry.describe('http_db_queries', 'Database queries issued per request.')
+registry.describe('http_db_duration_seconds', 'Database time per request.')
+registry.describe('alerts_phase_duration_seconds', 'check_alerts time per phase.')
+
+
+@contextmanager
+def timed(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - started, **labels)
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,142 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import COUNT_BUCKETS, registry
+
+logger = logging.getLogger('bck.performance')
+
+# The QueryRecorder of the request being served. A context variable rather
+# than a per-request execute_wrapper on the connection, because under ASGI
+# sync views run their queries in another thread, which sync_to_async
+# hands the context to but not the caller's connection.
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class QueryRecorder:
+    """execute_wrapper that counts and times the queries of one request."""
+
+    def __init__(self, slow_query_seconds):
+        self.slow_query_seconds = slow_query_seconds
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if elapsed >= self.slow_query_seconds:
+                logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, sql)
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper installed on every connection; records into current_recorder."""
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(request_started)
+def install_query_recorders(sender, **kwargs):
+    # Connections opened before this module was imported. Sync receivers
+    # run on the thread that serves sync views, ASGI or not.
+    for opened in connections.all(initialized_only=True):
+        install_query_recorder(sender, opened)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, render time and database queries per view into
+    bck.metrics.registry, and logs requests and queries slower than
+    METRICS_SLOW_REQUEST_MS / METRICS_SLOW_QUERY_MS. Streaming responses
+    are only counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_seconds = settings.METRICS_SLOW_REQUEST_MS / 1000
+        self.slow_query_seconds = settings.METRICS_SLOW_QUERY_MS / 1000
+        # Under ASGI run as a coroutine, so async views such as the live
+        # reports stream aren't pushed through a thread around this.
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        recorder = QueryRecorder(self.slow_query_seconds)
+        token = current_recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        recorder = QueryRecorder(self.slow_query_seconds)
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    def record(self, request, response, elapsed, recorder):
+        match = request.resolver_match
+        view = (match.view_name or match.route) if match else 'unmatched'
+        labels = {'view': view, 'method': request.method}
+        registry.inc('http_requests_total', status=response.status_code, **labels)
+        if response.streaming:
+            # Only the time to the headers is known here; a stream such as
+            # /api/alerts/live/ stays open for as long as the client does,
+            # so neither is a latency.
+            return
+        registry.observe('http_request_duration_seconds', elapsed, **labels)
+        registry.observe('http_db_queries', recorder.count, buckets=COUNT_BUCKETS, **labels)
+        registry.observe('http_db_duration_seconds', recorder.seconds, **labels)
+        render_seconds = getattr(request, '_metrics_render_seconds', None)
+        if render_seconds is not None:
+            registry.observe('http_render_duration_seconds', render_seconds, **labels)
+
+        if elapsed >= self.slow_request_seconds:
+            logger.warning(
+                'Slow request (%.1f ms, %d queries in %.1f ms): %s %s',
+                elapsed * 1000, recorder.count, recorder.seconds * 1000, request.method, request.get_full_path(),
+            )
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns; time
+        # that step from here to the post-render callback.
+        started = time.perf_counter()
+
+        def finished(rendered):
+            request._metrics_render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(finished)
+        return response
@@ -32,6 +32,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'bck.middleware.MetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'bck.urls'
@@ -54,10 +55,62 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'bck.wsgi.application'
 
-DATABASES = {
+# DB_ENGINE=postgres switches to PostgreSQL (DB_NAME, DB_USER, DB_PASSWORD,
+# DB_HOST, DB_PORT). Connections are kept open for DB_CONN_MAX_AGE seconds,
+# or pooled by psycopg when DB_POOL=True. Anything else runs on SQLite at
+# DB_NAME (default db.sqlite3) in WAL mode, so readers do not block the
+# single writer. Point DB_NAME at a throwaway database to try either locally.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'food_safety'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.getenv('DB_POOL', 'False') == 'True':
+        # Django refuses persistent connections on top of a pool.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Take the write lock up front instead of failing to upgrade
+                # a read lock when two requests write at once.
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA mmap_size=134217728;'
+                ),
+            },
+        }
+    }
+
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# cache such as django.core.cache.backends.redis.RedisCache when running
+# several processes, so invalidations reach all of them.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -92,6 +145,10 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
@@ -105,4 +162,53 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
-TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
\ No newline at end of file
+TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
+
+# Alert delivery: per-channel worker/connection limits, retries and the
+# exponential backoff base in seconds. Point ALERTS_SMS_TRANSPORT at
+# alerts.delivery.FakeSmsTransport to run offline.
+ALERTS_SMS_TRANSPORT = os.getenv('ALERTS_SMS_TRANSPORT', 'alerts.delivery.TwilioTransport')
+ALERTS_DELIVERY_CONCURRENCY = {'email': 4, 'sms': 8}
+ALERTS_DELIVERY_RETRIES = 2
+ALERTS_DELIVERY_BACKOFF = 0.5
+
+# Digest mode sends each subscriber one message per channel per run,
+# listing at most ALERTS_DIGEST_MAX_ITEMS reports plus a "+N more" line.
+ALERTS_DIGEST = os.getenv('ALERTS_DIGEST', 'True') == 'True'
+ALERTS_DIGEST_MAX_ITEMS = 5
+
+# check_alerts streams subscriptions past the new reports this many rows at
+# a time; --shard-index/--shard-count split a run across processes.
+ALERTS_MATCH_CHUNK_SIZE = 2000
+
+# nearby_reports caches the reports of each grid cell for this many
+# seconds; new reports drop only the tile of the cell they land in.
+ALERTS_NEARBY_TILE_SECONDS = 60
+
+# Idle /api/alerts/live/ streams get a comment line this often.
+ALERTS_LIVE_HEARTBEAT_SECONDS = 15
+
+# Matched reports stay in a subscriber's /api/alerts/inbox/ for this many
+# days after the report was created; check_alerts prunes older entries.
+ALERTS_INBOX_DAYS = 30
+ALERTS_INBOX_PAGE_SIZE = 20
+
+# Outbreak clusters: a business, grid cell or business/cell + symptom with
+# at least ALERTS_CLUSTER_THRESHOLD reports in the last
+# ALERTS_CLUSTER_WINDOW_HOURS hours.
+ALERTS_CLUSTER_WINDOW_HOURS = 6
+ALERTS_CLUSTER_THRESHOLD = 3
+
+# Request metrics (bck.middleware.MetricsMiddleware): requests and queries
+# slower than these are logged to bck.performance; METRICS_ENDPOINT exposes
+# the registry in Prometheus text format at /metrics.
+METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', '500'))
+METRICS_SLOW_QUERY_MS = int(os.getenv('METRICS_SLOW_QUERY_MS', '100'))
+METRICS_ENDPOINT = os.getenv('METRICS_ENDPOINT', 'False') == 'True'
+
+# Report retention: archive_reports moves reports older than
+# REPORTS_RETENTION_DAYS out of api_report, into the ArchivedReport table
+# (/api/archived-reports/) or, when REPORTS_ARCHIVE_DIR is set, into
+# gzipped NDJSON files there, one per month.
+REPORTS_RETENTION_DAYS = int(os.getenv('REPORTS_RETENTION_DAYS', '365'))
+REPORTS_ARCHIVE_DIR = os.getenv('REPORTS_ARCHIVE_DIR')
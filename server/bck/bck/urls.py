@@ -14,9 +14,12 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path("blog/", include("blog.urls"))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
      # Include your app's URLs
     path('admin/', admin.site.urls),
@@ -24,3 +27,5 @@ urlpatterns = [
     path("api/", include("api.urls")), # Include your app's URLs
 ]
 
+if settings.METRICS_ENDPOINT:
+    urlpatterns.append(path("metrics", metrics_view, name="metrics"))